@@ -1,12 +1,37 @@
+import os
 from flask import Flask
-from flask_migrate import Migrate
 from flask_restful import Api
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.middleware.proxy_fix import ProxyFix
 from app.models import db
+from app import archive, cache, facets, locations, sync, duplicates, quote_stats, ratings, rollups
+from app.feed import job_feed
+from app.compression import init_compression
+from app.ratelimit import rate_limiter
+from app.commands import register_commands
+from app.cache import row_cache
+from app.readiness import readiness
 from config import config
 import json
 from datetime import datetime
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Custom JSON encoder for datetime serialization
+class CustomJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        # Handle Pydantic models
+        if hasattr(obj, 'dict') and callable(getattr(obj, 'dict')):
+            return obj.dict()
+        # Handle Pydantic models with model_dump (newer versions)
+        if hasattr(obj, 'model_dump') and callable(getattr(obj, 'model_dump')):
+            return obj.model_dump()
+        return super().default(obj)
+
 def create_app(config_name='default'):
     """Application factory function"""
     app = Flask(__name__)
@@ -17,26 +42,28 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
 
+    # Trust X-Forwarded-For from our own proxies so clients are told apart by address
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
     # Initialize extensions
     db.init_app(app)
-    migrate = Migrate(app, db)
+    register_session_hooks()
+
+    # Alembic is slow to import, so the `flask db` commands are only wired up under the flask CLI
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+    job_feed.init_app(app)
+    init_compression(app)
+    rate_limiter.init_app(app)
+    row_cache.init_app(app)
+    readiness.init_app(app)
+    register_commands(app)
 
     # Initialize Flask-RESTful API
     api = Api(app, prefix='/api/v1')
 
-    # Configure custom JSON encoder for datetime serialization
-    class CustomJSONEncoder(json.JSONEncoder):
-        def default(self, obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            # Handle Pydantic models
-            if hasattr(obj, 'dict') and callable(getattr(obj, 'dict')):
-                return obj.dict()
-            # Handle Pydantic models with model_dump (newer versions)
-            if hasattr(obj, 'model_dump') and callable(getattr(obj, 'model_dump')):
-                return obj.model_dump()
-            return super().default(obj)
-
     # Override Flask-RESTful's JSON representation
     from flask import make_response
     api.representations['application/json'] = lambda data, code, headers=None: make_response(
@@ -46,20 +73,34 @@ def create_app(config_name='default'):
     )
 
     # Import and register resources
-    from app.resources.users import UserListResource, UserResource
-    from app.resources.jobs import JobListResource, JobResource
-    from app.resources.quotes import QuoteListResource, QuoteResource
+    from app.resources.users import UserListResource, UserResource, UserByPhoneResource, UserDashboardResource
+    from app.resources.jobs import JobListResource, JobFacetsResource, JobStreamResource, JobResource
+    from app.resources.quotes import QuoteListResource, QuoteStatsResource, QuoteResource
     from app.resources.reviews import ReviewListResource, ReviewResource
+    from app.resources.saved_jobs import SavedJobListResource, SavedJobResource
+    from app.resources.sync import SyncResource
+    from app.resources.batch import BatchResource
+    from app.resources.rollups import DailyStatsResource
 
     # Register API endpoints
     api.add_resource(UserListResource, '/users')
     api.add_resource(UserResource, '/users/<int:user_id>')
+    api.add_resource(UserByPhoneResource, '/users/by-phone/<string:phone>')
+    api.add_resource(UserDashboardResource, '/users/<int:user_id>/dashboard')
+    api.add_resource(SavedJobListResource, '/users/<int:user_id>/saved-jobs')
+    api.add_resource(SavedJobResource, '/users/<int:user_id>/saved-jobs/<int:job_id>')
     api.add_resource(JobListResource, '/jobs')
+    api.add_resource(JobFacetsResource, '/jobs/facets')
+    api.add_resource(JobStreamResource, '/jobs/stream')
     api.add_resource(JobResource, '/jobs/<int:job_id>')
     api.add_resource(QuoteListResource, '/quotes')
+    api.add_resource(QuoteStatsResource, '/quotes/stats')
     api.add_resource(QuoteResource, '/quotes/<int:quote_id>')
     api.add_resource(ReviewListResource, '/reviews')
     api.add_resource(ReviewResource, '/reviews/<int:review_id>')
+    api.add_resource(SyncResource, '/sync')
+    api.add_resource(BatchResource, '/batch')
+    api.add_resource(DailyStatsResource, '/stats/daily')
 
     # Add health check endpoint
     @app.route('/health')
@@ -67,9 +108,16 @@ def create_app(config_name='default'):
         """Health check endpoint"""
         return {
             'status': 'healthy',
-            'message': 'Mtaa-Fundi Finder API is running'
+            'message': 'Mtaa-Fundi Finder API is running',
+            'row_cache': row_cache.stats()
         }, 200
 
+    @app.route('/ready')
+    def readiness_check():
+        """Readiness endpoint: 503 while a database is unreachable or a limit is exceeded"""
+        report, ready = readiness.check()
+        return report, 200 if ready else 503
+
     # Add API documentation endpoint
     @app.route('/')
     def api_docs():
@@ -78,24 +126,38 @@ def create_app(config_name='default'):
             'name': 'Mtaa-Fundi Finder API',
             'version': '1.0.0',
             'description': 'API for connecting homeowners with local artisans in Kenya',
+            'query_parameters': {
+                'fields': 'Comma-separated fields to render, e.g. fields=id,price',
+                'expand': 'Comma-separated nested objects to render, e.g. expand=job,job.user (omit for all)',
+                'format': 'format=compound returns list rows with ids and nested objects once each under "included"',
+                'ids': 'On list endpoints, ids=3,1,2 fetches those rows in that order; unknown ids are listed under "missing"'
+            },
             'endpoints': {
                 'users': {
-                    'GET /api/v1/users': 'List all users',
+                    'GET /api/v1/users': 'List all users (filters: role, location, e.g. "Nairobi" for every area in the county; sort: id, rating, reviews; pass limit and/or cursor for keyset pages with next_cursor)',
                     'POST /api/v1/users': 'Create a new user',
                     'GET /api/v1/users/<id>': 'Get user by ID',
+                    'GET /api/v1/users/by-phone/<phone>': 'Get user by phone number (any format, e.g. 0712345678)',
                     'PUT /api/v1/users/<id>': 'Update user',
-                    'DELETE /api/v1/users/<id>': 'Delete user'
+                    'DELETE /api/v1/users/<id>': 'Delete user',
+                    'GET /api/v1/users/<id>/dashboard': "Get a fundi's quotes, win rate, earnings and ratings",
+                    'GET /api/v1/users/<id>/saved-jobs': 'List jobs saved by a user',
+                    'PUT /api/v1/users/<id>/saved-jobs/<job_id>': 'Save a job',
+                    'DELETE /api/v1/users/<id>/saved-jobs/<job_id>': 'Unsave a job'
                 },
                 'jobs': {
-                    'GET /api/v1/jobs': 'List all jobs (with optional filters)',
-                    'POST /api/v1/jobs': 'Create a new job',
+                    'GET /api/v1/jobs': 'List all jobs (filters: status, category, user_id, location, saved_by, budget_min, budget_max, date_from, date_to; sort: newest, budget, -budget, preferred_date)',
+                    'POST /api/v1/jobs': 'Create a new job; the response lists similar open jobs under "duplicates"',
+                    'GET /api/v1/jobs/facets': 'Get job counts by category, status, location and budget',
+                    'GET /api/v1/jobs/stream?category=<c>&location=<l>': 'Stream new jobs as Server-Sent Events',
                     'GET /api/v1/jobs/<id>': 'Get job by ID',
                     'PUT /api/v1/jobs/<id>': 'Update job',
                     'DELETE /api/v1/jobs/<id>': 'Delete job'
                 },
                 'quotes': {
-                    'GET /api/v1/quotes?job_id=<id>': 'Get quotes for a job',
+                    'GET /api/v1/quotes?job_id=<id>|user_id=<id>': 'Get quotes for a job or by a fundi',
                     'POST /api/v1/quotes': 'Create a new quote',
+                    'GET /api/v1/quotes/stats?job_id=<id>|category=<c>&location=<l>': 'Get min/median/p90/mean quote prices',
                     'GET /api/v1/quotes/<id>': 'Get quote by ID',
                     'PUT /api/v1/quotes/<id>': 'Update quote',
                     'DELETE /api/v1/quotes/<id>': 'Delete quote'
@@ -106,8 +168,40 @@ def create_app(config_name='default'):
                     'GET /api/v1/reviews/<id>': 'Get review by ID',
                     'PUT /api/v1/reviews/<id>': 'Update review',
                     'DELETE /api/v1/reviews/<id>': 'Delete review'
+                },
+                'sync': {
+                    'GET /api/v1/sync?since=<token>': 'Get rows changed or deleted since a sync token'
+                },
+                'stats': {
+                    'GET /api/v1/stats/daily': 'Get jobs, quotes and reviews per day with averages (filters: date_from, date_to, category, location, status)'
+                },
+                'batch': {
+                    'POST /api/v1/batch': 'Run several requests in one round trip: {"requests": [{"method", "path", "body"}], "parallel": false}'
                 }
             }
         }, 200
 
     return app
+
+def register_session_hooks():
+    """Attach the session hooks that check review jobs and keep derived data current: caches, locations,
+    tombstones, signatures, quote stats, ratings and rollups. Hooks on the same event run in the order listed."""
+    for module in (archive, cache, facets, locations, sync, duplicates, quote_stats, ratings, rollups):
+        for name, hook in module.SESSION_HOOKS:
+            if not event.contains(Session, name, hook):
+                event.listen(Session, name, hook)
+
+def create_tables(app):
+    """Create missing tables when AUTO_CREATE_TABLES is set (production runs migrations instead)"""
+    if app.config['AUTO_CREATE_TABLES']:
+        with app.app_context():
+            db.create_all()
+            if app.config['SHARD_DATABASE_URLS']:
+                from app.sharding import create_shard_tables
+                create_shard_tables()
+
+def dispose_engines(app):
+    """Drop pooled connections inherited from the master process after a fork"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.models import Job, Quote, Review, ArchivedJob, ArchivedQuote, Tombstone, saved_jobs, db
+from app.cache import invalidate
+from app.sharding import MAIN_SHARD, shard_ids
+
+# Hot tables whose size the archiver reports
+HOT_TABLES = (Job.__table__, Quote.__table__)
+
+
+def find_archived(model, row_id):
+    """Archived row by id, or None (also when the archive tables have not been created yet)"""
+    try:
+        return db.session.get(model, row_id)
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return None
+
+
+def find_archived_rows(query):
+    """All rows of an archive query, or none if the archive tables have not been created yet"""
+    try:
+        return query.all()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return []
+
+
+def archived_fundi_quotes(user_id):
+    """A fundi's archived quotes, shaped like dashboard.fundi_quotes rows"""
+    rows = find_archived_rows(db.session.query(ArchivedQuote, ArchivedJob.title, ArchivedJob.status)
+                              .join(ArchivedJob, ArchivedQuote.job_id == ArchivedJob.id)
+                              .filter(ArchivedQuote.user_id == user_id))
+    if not rows:
+        return []
+    won = set(db.session.scalars(
+        select(Review.job_id).where(Review.reviewee_id == user_id,
+                                    Review.job_id.in_({quote.job_id for quote, _, _ in rows}))
+    ))
+    return [(quote, title, status, quote.job_id in won) for quote, title, status in rows]
+
+
+def _copies(rows, model, now):
+    """Rows as values for ``model``'s table, stamped with the archive time"""
+    columns = set(model.__table__.columns.keys())
+    return [{**{key: value for key, value in row.items() if key in columns}, 'archived_at': now} for row in rows]
+
+
+def _archived_ids(model, ids):
+    return set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+
+
+def archive_batch(job_ids, shard=MAIN_SHARD):
+    """Move closed jobs ``job_ids`` and their quotes from ``shard`` to the archive.
+
+    The copies are committed and read back before anything is deleted, since
+    the archive may be another database than the hot rows and no one
+    transaction spans both. Safe to repeat at any point: rows already in
+    the archive are not copied twice, and the delete only removes rows whose
+    copies are there.
+    """
+    now = datetime.utcnow()
+    hot = {'shard': shard}
+    jobs = db.session.execute(select(Job.__table__).where(Job.__table__.c.id.in_(job_ids)),
+                              bind_arguments=hot).mappings().all()
+    quotes = db.session.execute(select(Quote.__table__).where(Quote.__table__.c.job_id.in_(job_ids)),
+                                bind_arguments=hot).mappings().all()
+    quote_ids = [quote['id'] for quote in quotes]
+
+    archived_jobs = _archived_ids(ArchivedJob, job_ids)
+    archived_quotes = _archived_ids(ArchivedQuote, quote_ids)
+    new_jobs = _copies([job for job in jobs if job['id'] not in archived_jobs], ArchivedJob, now)
+    new_quotes = _copies([quote for quote in quotes if quote['id'] not in archived_quotes], ArchivedQuote, now)
+    if new_jobs:
+        db.session.execute(insert(ArchivedJob.__table__), new_jobs, bind_arguments={'mapper': ArchivedJob.__mapper__})
+    if new_quotes:
+        db.session.execute(insert(ArchivedQuote.__table__), new_quotes,
+                           bind_arguments={'mapper': ArchivedQuote.__mapper__})
+    db.session.commit()
+
+    archived_jobs = _archived_ids(ArchivedJob, job_ids)
+    archived_quotes = _archived_ids(ArchivedQuote, quote_ids)
+    missing = [job['id'] for job in jobs if job['id'] not in archived_jobs]
+    missing += [quote['job_id'] for quote in quotes if quote['id'] not in archived_quotes]
+    if missing:
+        raise RuntimeError(f'Archive copies of jobs {sorted(set(missing))} are missing; their hot rows were kept')
+
+    # Core deletes: archived rows are not deletions, so no summary updates. They do leave the hot set
+    # that sync serves, so clients get tombstones and drop them (detail GETs still find them)
+    tombstones = ([{'table_name': Job.__tablename__, 'row_id': job['id']} for job in jobs] +
+                  [{'table_name': Quote.__tablename__, 'row_id': quote_id} for quote_id in quote_ids])
+    if tombstones:
+        db.session.execute(insert(Tombstone.__table__), tombstones, bind_arguments={'mapper': Tombstone.__mapper__})
+    db.session.execute(delete(saved_jobs).where(saved_jobs.c.job_id.in_(job_ids)))
+    db.session.execute(delete(Quote.__table__).where(Quote.__table__.c.id.in_(quote_ids)), bind_arguments=hot)
+    db.session.execute(delete(Job.__table__).where(Job.__table__.c.id.in_(job_ids)), bind_arguments=hot)
+    db.session.commit()
+    invalidate(Job, job_ids)
+    return len(jobs), len(quotes)
+
+
+def archive_closed_jobs(older_than_days, batch_size, progress=None):
+    """Archive closed jobs created more than ``older_than_days`` ago, shard by shard, ``batch_size`` jobs per transaction.
+
+    Each batch commits on its own, so an interrupted run resumes where it
+    stopped when run again, including a batch copied but not yet deleted. Returns (jobs archived, quotes archived).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total_jobs = total_quotes = 0
+    for shard in shard_ids():
+        while True:
+            job_ids = list(db.session.scalars(
+                select(Job.id).where(Job.status == 'closed', Job.created_at < cutoff).order_by(Job.id).limit(batch_size),
+                bind_arguments={'shard': shard}
+            ))
+            if not job_ids:
+                break
+            jobs, quotes = archive_batch(job_ids, shard)
+            total_jobs += jobs
+            total_quotes += quotes
+            if progress is not None:
+                progress(total_jobs, total_quotes)
+    return total_jobs, total_quotes
+
+
+def table_sizes():
+    """Row count and, where the database can tell, on-disk bytes (with indexes) of each hot table"""
+    dialect = db.engine.dialect.name
+    sizes = {}
+    for table in HOT_TABLES:
+        size = None
+        try:
+            if dialect == 'postgresql':
+                size = db.session.scalar(text('SELECT pg_total_relation_size(:name)'), {'name': table.name})
+            elif dialect == 'sqlite':
+                # Needs SQLite built with the dbstat virtual table
+                size = db.session.scalar(text(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                    '(SELECT name FROM sqlite_master WHERE tbl_name = :name)'
+                ), {'name': table.name})
+        except (OperationalError, ProgrammingError):
+            db.session.rollback()
+        sizes[table.name] = {
+            'rows': db.session.scalar(select(func.count()).select_from(table)),
+            'bytes': size
+        }
+    return sizes
+
+
+def check_review_jobs(session, flush_context, instances):
+    """Stand in for the foreign key reviews.job_id gave up so reviews can outlive their archived job.
+
+    A new review must name a job that is hot or archived, and a job cannot
+    be deleted while reviews point at it (archiving deletes with Core
+    statements, which this does not see).
+    """
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Review) and obj.job is None and obj.job_id is not None:
+                if session.get(Job, obj.job_id) is None and find_archived(ArchivedJob, obj.job_id) is None:
+                    raise ValueError(f'Job {obj.job_id} does not exist')
+        for obj in session.deleted:
+            if isinstance(obj, Job) and obj.reviews:
+                raise ValueError(f'Job {obj.id} still has reviews')
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', check_review_jobs),
+)
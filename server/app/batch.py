@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+
+API_PREFIX = '/api/v1'
+
+# Streams never finish and batches do not nest
+EXCLUDED_ENDPOINTS = {'jobstreamresource', 'batchresource'}
+
+# Outer request headers not passed on to sub-requests; an idempotency key names one request, not each part
+DROPPED_HEADERS = {'content-type', 'content-length', 'idempotency-key'}
+
+
+def parse_batch(payload, max_requests):
+    """Validate a batch body into a list of (method, path, query string, body); raises ValueError"""
+    if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+        raise ValueError('Body must be an object with a "requests" list')
+    items = payload['requests']
+    if not items:
+        raise ValueError('requests must contain at least one request')
+    if len(items) > max_requests:
+        raise ValueError(f'A batch accepts at most {max_requests} requests')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise ValueError(f'requests[{index}] must be an object with a "path"')
+        method = str(item.get('method', 'GET')).upper()
+        url = urlsplit(item['path'])
+        path = url.path if url.path.startswith(API_PREFIX + '/') else API_PREFIX + '/' + url.path.lstrip('/')
+        parsed.append((method, path, url.query, item.get('body')))
+    return parsed
+
+
+def resolve(app, method, path, query):
+    """(endpoint, query args) a sub-request routes to, or (None, None) if it does not match"""
+    try:
+        endpoint, _ = app.url_map.bind('localhost').match(path, method)
+    except HTTPException:
+        return None, None
+    return endpoint, parse_qs(query)
+
+
+def _error(status, message):
+    return {'status': status, 'body': {'success': False, 'message': message}}
+
+
+def run_subrequest(app, method, path, query, body, client):
+    """Dispatch one sub-request through the resource that serves ``path``, without a network hop.
+
+    The sub-request reuses the current app context, and with it the
+    request's database session and identity map, when one is active.
+    """
+    headers, remote_addr = client
+    with app.test_request_context(path, method=method, query_string=query, json=body,
+                                  headers=headers, environ_base={'REMOTE_ADDR': remote_addr}):
+        if request.routing_exception is not None:
+            return _error(request.routing_exception.code, request.routing_exception.description)
+        if request.url_rule.endpoint in EXCLUDED_ENDPOINTS:
+            return _error(400, f'{path} cannot be used in a batch')
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as e:
+            return _error(e.code, e.description)
+        return {'status': response.status_code, 'body': response.get_json(silent=True)}
+
+
+def _run_in_own_context(app, *args):
+    with app.app_context():
+        return run_subrequest(app, *args)
+
+
+def run_batch(requests, parallel=False):
+    """Run sub-requests in order, or concurrently (reads only) with their own sessions"""
+    app = current_app._get_current_object()
+    client = ({key: value for key, value in request.headers if key.lower() not in DROPPED_HEADERS},
+               request.remote_addr)
+
+    if not parallel:
+        return [run_subrequest(app, method, path, query, body, client) for method, path, query, body in requests]
+
+    with ThreadPoolExecutor(max_workers=min(len(requests), app.config['BATCH_MAX_WORKERS'])) as executor:
+        futures = [executor.submit(_run_in_own_context, app, method, path, query, body, client)
+                   for method, path, query, body in requests]
+        return [future.result() for future in futures]
+
+
+def requests_cost(limiter, requests):
+    """What the parsed sub-requests would cost on their own"""
+    total = 0
+    for method, path, query, _ in requests:
+        endpoint, args = resolve(current_app, method, path, query)
+        total += limiter.cost(endpoint, method, args) if endpoint else 1
+    return total
+
+
+def check_cost(limiter, requests):
+    """Raise ValueError for a batch costing more than a full bucket holds, which could never be let through"""
+    config = current_app.config
+    if not config['RATELIMIT_ENABLED']:
+        return
+    cost = requests_cost(limiter, requests)
+    if cost > config['RATELIMIT_BURST']:
+        raise ValueError(f"This batch costs {cost} rate-limit tokens; a batch may cost at most "
+                         f"{config['RATELIMIT_BURST']}, so split it up")
+
+
+def batch_cost(limiter):
+    """Rate-limit cost of a batch: what its sub-requests would cost on their own.
+
+    Invalid batches, and ones over the bucket size, cost 1: the resource
+    refuses them with a 400 rather than the limiter with a 429 that no
+    amount of waiting would clear.
+    """
+    try:
+        requests = parse_batch(request.get_json(silent=True), current_app.config['BATCH_MAX_REQUESTS'])
+    except ValueError:
+        return 1
+    total = requests_cost(limiter, requests)
+    return total if total <= current_app.config['RATELIMIT_BURST'] else 1
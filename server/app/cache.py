@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from app.models import User, Job, db
+
+
+class RowCache:
+    """Bounded LRU of row snapshots with a TTL and hit/miss counters.
+
+    Entries are evicted when this process flushes or commits a change to
+    the row; the TTL bounds how long writes from other workers go unseen,
+    so checks where a stale row is unsafe, like a job's status before a
+    quote, read past the cache (``fresh=True``).
+    """
+
+    def __init__(self, max_size=10000, ttl=10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.enabled = app.config['ROW_CACHE_ENABLED']
+        self.max_size = app.config['ROW_CACHE_SIZE']
+        self.ttl = app.config['ROW_CACHE_TTL_SECONDS']
+        app.extensions['row_cache'] = self
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+row_cache = RowCache()
+
+
+class RowSnapshot:
+    """Read-only copy of a row's column values, safe to share between requests"""
+
+    def __init__(self, obj):
+        for attr in obj.__mapper__.column_attrs:
+            self.__dict__[attr.key] = getattr(obj, attr.key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Row snapshots are read-only')
+
+
+class UserSnapshot(RowSnapshot):
+    pass
+
+
+class JobSnapshot(RowSnapshot):
+
+    @property
+    def user(self):
+        return get_user(self.user_id)
+
+
+SNAPSHOTS = {User: UserSnapshot, Job: JobSnapshot}
+
+
+def _get(model, row_id, fresh=False):
+    """Read-through lookup of a row snapshot by primary key"""
+    if row_id is None:
+        return None
+    try:
+        key = (model.__tablename__, int(row_id))
+    except (TypeError, ValueError):
+        return None
+    if not row_cache.enabled:
+        obj = db.session.get(model, key[1])
+        return SNAPSHOTS[model](obj) if obj is not None else None
+
+    snapshot = None if fresh else row_cache.get(key)
+    if snapshot is None:
+        obj = db.session.get(model, key[1])
+        if obj is None:
+            row_cache.invalidate(key)
+            return None
+        snapshot = SNAPSHOTS[model](obj)
+        row_cache.set(key, snapshot)
+    return snapshot
+
+
+def get_user(user_id, fresh=False):
+    """Snapshot of a user by id, or None.
+
+    Existence and role checks ahead of a write are served from the cache:
+    roles rarely change, and a change or delete on another worker reaches
+    this one within the TTL. Pass ``fresh=True`` where that window is not
+    acceptable; the row is then read from the database (and re-cached).
+    """
+    return _get(User, user_id, fresh)
+
+
+def get_job(job_id, fresh=False):
+    """Snapshot of a job by id, or None; ``fresh=True`` reads it from the database as for :func:`get_user`"""
+    return _get(Job, job_id, fresh)
+
+
+def invalidate(model, row_ids):
+    for row_id in row_ids:
+        row_cache.invalidate((model.__tablename__, row_id))
+
+
+def _evict_flushed_rows(session, flush_context):
+    """Evict rows written in this flush, and remember them to evict again on commit"""
+    written = session.info.setdefault('row_cache_written', set())
+    for obj in (*session.dirty, *session.deleted):
+        if type(obj) in SNAPSHOTS and obj.id is not None:
+            key = (obj.__tablename__, obj.id)
+            written.add(key)
+            row_cache.invalidate(key)
+
+
+def _evict_committed_rows(session):
+    # A concurrent request may have re-cached the old row between our flush and commit
+    for key in session.info.pop('row_cache_written', ()):
+        row_cache.invalidate(key)
+
+
+def _forget_written_rows(session):
+    session.info.pop('row_cache_written', None)
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('after_flush', _evict_flushed_rows),
+    ('after_commit', _evict_committed_rows),
+    ('after_rollback', _forget_written_rows),
+)
@@ -0,0 +1,85 @@
+import click
+
+
+def register_commands(app):
+    """Register maintenance commands with the flask CLI"""
+
+    @app.cli.command('rebuild-quote-stats')
+    def rebuild_quote_stats_command():
+        """Recompute quote price summaries from the quotes table."""
+        from app.quote_stats import rebuild_quote_stats
+        count = rebuild_quote_stats()
+        click.echo(f'Rebuilt quote statistics from {count} quotes')
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Only recompute days from this date (YYYY-MM-DD); default: every day.')
+    def rebuild_rollups_command(since):
+        """Recompute the daily job, quote and review rollups from the tables."""
+        from app.rollups import rebuild_rollups
+        count = rebuild_rollups(since.date() if since else None)
+        click.echo(f'Rebuilt {count} daily rollup rows' + (f" from {since.date().isoformat()}" if since else ''))
+
+    @app.cli.command('export-analytics')
+    @click.option('--output', required=True, type=click.Path(file_okay=False), help='Directory to write one file per table to.')
+    @click.option('--format', 'fmt', type=click.Choice(['auto', 'parquet', 'arrow', 'csv']), default='auto',
+                  help='File format; auto picks Parquet when pyarrow is installed, else CSV.')
+    @click.option('--table', 'tables', multiple=True, help='Table to export (repeatable; default: rollups and raw tables).')
+    def export_analytics_command(output, fmt, tables):
+        """Export the daily rollups and raw tables to columnar files for offline analysis."""
+        from app.export import export_tables
+        try:
+            written = export_tables(output, fmt, list(tables), app.config['ANALYTICS_EXPORT_BATCH_SIZE'])
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for name, (path, count) in written.items():
+            click.echo(f'  {name}: {count} rows -> {path}')
+
+    @app.cli.command('rebuild-job-signatures')
+    def rebuild_job_signatures_command():
+        """Recompute the near-duplicate signatures of every open job."""
+        from app.duplicates import rebuild_signature_index
+        count = rebuild_signature_index()
+        click.echo(f'Indexed {count} open jobs')
+
+    @app.cli.command('sweep-idempotency-keys')
+    def sweep_idempotency_keys_command():
+        """Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL_SECONDS."""
+        from app.idempotency import sweep_idempotency_keys
+        count = sweep_idempotency_keys(app.config['IDEMPOTENCY_TTL_SECONDS'])
+        click.echo(f'Removed {count} expired idempotency keys')
+
+    @app.cli.command('init-shards')
+    def init_shards_command():
+        """Create the jobs, quotes and reviews tables in each SHARD_DATABASE_URLS database and seed the id counters."""
+        from app.sharding import create_shard_tables, shard_ids
+        if not app.config['SHARD_DATABASE_URLS']:
+            raise click.ClickException('SHARD_DATABASE_URLS is not set')
+        create_shard_tables()
+        click.echo(f"Initialized shards: {', '.join(shard_ids())}")
+
+    @app.cli.command('archive-jobs')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive closed jobs created more than this many days ago (default: ARCHIVE_AFTER_DAYS).')
+    @click.option('--batch-size', type=int, default=None, help='Jobs moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+    def archive_jobs_command(older_than_days, batch_size):
+        """Move old closed jobs and their quotes to the archive tables, then report hot-table sizes."""
+        from app.models import db
+        from app.archive import archive_closed_jobs, table_sizes
+        if 'archive' in app.config['SQLALCHEMY_BINDS']:
+            db.create_all(bind_key='archive')
+
+        before = table_sizes()
+        jobs, quotes = archive_closed_jobs(
+            older_than_days if older_than_days is not None else app.config['ARCHIVE_AFTER_DAYS'],
+            batch_size or app.config['ARCHIVE_BATCH_SIZE'],
+            progress=lambda jobs, quotes: click.echo(f'  archived {jobs} jobs, {quotes} quotes so far')
+        )
+        after = table_sizes()
+
+        click.echo(f'Archived {jobs} jobs and {quotes} quotes')
+        for table, size in before.items():
+            line = f"  {table}: {size['rows']} -> {after[table]['rows']} rows"
+            if size['bytes'] is not None and after[table]['bytes'] is not None:
+                line += f", {size['bytes'] / 1024:.0f} KiB -> {after[table]['bytes'] / 1024:.0f} KiB"
+            click.echo(line)
@@ -0,0 +1,54 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    gzip_quality = accept_encodings.quality('gzip')
+    if brotli is not None:
+        brotli_quality = accept_encodings.quality('br')
+        if brotli_quality > 0 and brotli_quality >= gzip_quality:
+            return 'br'
+    if gzip_quality > 0:
+        return 'gzip'
+    return None
+
+
+def init_compression(app):
+    """Compress responses negotiated via Accept-Encoding (brotli when installed, else gzip)"""
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config['COMPRESS_ENABLED']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if (response.direct_passthrough
+                or response.is_streamed
+                or response.status_code < 200
+                or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding == 'br':
+            data = brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+        elif encoding == 'gzip':
+            data = gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'])
+        else:
+            return response
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        return response
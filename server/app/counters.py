@@ -0,0 +1,27 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def add_to_rows(connection, table, keys, rows, assign=None):
+    """Insert ``rows``, or add their values onto the stored row with the same ``keys`` columns.
+
+    One INSERT ... ON CONFLICT DO UPDATE: concurrent writers neither lose
+    increments nor race to insert a missing row, and nothing is read or
+    locked beforehand. Rows are written in key order, so transactions that
+    touch the same rows lock them in the same order and cannot deadlock.
+    ``assign(table, excluded)`` gives the SET clause of columns that are not
+    simply added up.
+    """
+    if not rows:
+        return
+    dialect = UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect is None:
+        raise NotImplementedError(f'Counters need PostgreSQL or SQLite, not {connection.dialect.name}')
+    stmt = dialect.insert(table)
+    values = {name: table.c[name] + stmt.excluded[name] for name in rows[0] if name not in keys}
+    if assign is not None:
+        values.update(assign(table, stmt.excluded))
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+    connection.execute(stmt.on_conflict_do_update(index_elements=keys, set_=values), rows)
@@ -0,0 +1,83 @@
+from sqlalchemy import desc, func, exists, and_
+from sqlalchemy.orm import selectinload
+from app.models import Quote, Job, Review, db
+from app.schemas import QuoteResponse, ReviewResponse
+from app.serialization import Projection, render
+from app.archive import archived_fundi_quotes
+from app.sharding import merge_shards
+
+
+def fundi_quotes(user_id):
+    """The fundi's quotes with their job's title and status, and whether they won the job.
+
+    A quote counts as won when the job owner reviewed the fundi for that job.
+    """
+    won = exists().where(and_(Review.job_id == Quote.job_id, Review.reviewee_id == Quote.user_id))
+    rows = (db.session.query(Quote, Job.title, Job.status, won.label('won'))
+            .join(Job, Quote.job_id == Job.id)
+            .filter(Quote.user_id == user_id)
+            .order_by(desc(Quote.created_at))
+            .all())
+    return merge_shards(rows, desc(Quote.created_at), entity=lambda row: row[0])
+
+
+def rating_summary(user_id):
+    """Average rating, count and per-star histogram from one grouped query"""
+    histogram = {stars: 0 for stars in range(1, 6)}
+    rows = (db.session.query(Review.rating, func.count(Review.id))
+            .filter(Review.reviewee_id == user_id)
+            .group_by(Review.rating))
+    for rating, count in rows:
+        # Summed, as each shard returns its own group per rating
+        histogram[rating] += count
+    total = sum(histogram.values())
+    return {
+        'average': round(sum(stars * count for stars, count in histogram.items()) / total, 2) if total else 0.0,
+        'count': total,
+        'histogram': histogram
+    }
+
+
+def build_dashboard(user, recent_reviews=5):
+    """Dashboard for a fundi, built from a fixed number of queries regardless of activity.
+
+    Quotes on archived jobs are included after the live ones.
+    """
+    quotes = []
+    won_count = 0
+    earnings = 0.0
+    pending_count = 0
+    flat = Projection(expand=set())
+
+    for quote, job_title, job_status, won in fundi_quotes(user.id) + archived_fundi_quotes(user.id):
+        quotes.append({
+            **render(quote, QuoteResponse, flat),
+            'job_title': job_title,
+            'job_status': job_status,
+            'won': bool(won)
+        })
+        if won:
+            won_count += 1
+            earnings += quote.price
+        elif job_status == 'open':
+            pending_count += 1
+
+    decided = len(quotes) - pending_count
+    reviews = (Review.query
+               .options(selectinload(Review.reviewer))
+               .filter(Review.reviewee_id == user.id)
+               .order_by(desc(Review.created_at))
+               .limit(recent_reviews)
+               .all())
+    reviews = merge_shards(reviews, desc(Review.created_at), limit=recent_reviews)
+
+    return {
+        'quotes': quotes,
+        'quotes_count': len(quotes),
+        'won_count': won_count,
+        'pending_count': pending_count,
+        'win_rate': round(won_count / decided, 4) if decided else 0.0,
+        'earnings': earnings,
+        'rating': rating_summary(user.id),
+        'recent_reviews': [render(review, ReviewResponse, Projection(expand={'reviewer'})) for review in reviews]
+    }
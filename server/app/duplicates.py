@@ -0,0 +1,170 @@
+import hashlib
+import random
+import re
+import struct
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import select, insert, delete, func, desc
+from sqlalchemy.orm import attributes
+from app.models import Job, JobSignature, JobSignatureBucket, db
+from app.sharding import merge_shards
+
+# MinHash signature length, split into BANDS bands of ROWS values for LSH. A job becomes a
+# candidate when one band matches: almost surely from 0.6 similarity up, one time in five at 0.3
+BANDS = 32
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+
+SHINGLE_SIZE = 5  # Characters per shingle, so small edits change few shingles
+
+MAX_TEXT_LENGTH = 1000  # Longer posts are compared on their start, which bounds the cost of a signature
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # Fixed, so signatures stay comparable across processes and restarts
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def job_text(title, description):
+    """Title and description lowercased, with punctuation and runs of whitespace as single spaces, truncated"""
+    return _NON_WORD.sub(' ', f'{title} {description}'.lower()).strip()[:MAX_TEXT_LENGTH]
+
+
+@lru_cache(maxsize=1024)
+def minhash(text):
+    """MinHash signature of the character shingles of ``text``"""
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+    hashes = [_hash(shingle) for shingle in shingles]
+    return tuple(min([(a * value + b) % _PRIME for value in hashes]) for a, b in _PERMUTATIONS)
+
+
+def band_buckets(signature):
+    """One signed 64-bit bucket per band, distinct for equal values in different bands"""
+    buckets = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<I{ROWS}Q', band, *values), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+def pack(signature):
+    return struct.pack(f'<{NUM_HASHES}Q', *signature)
+
+
+def unpack(data):
+    return struct.unpack(f'<{NUM_HASHES}Q', data)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def find_duplicates(title, description, threshold, max_candidates):
+    """Open jobs whose title and description look like a near copy, most similar first.
+
+    The band buckets narrow the open jobs down to at most ``max_candidates``
+    sharing the most buckets, so the check costs two indexed queries however
+    many jobs are open. Returns [{job_id, user_id, similarity}].
+    """
+    signature = minhash(job_text(title, description))
+    candidates = list(db.session.scalars(
+        select(JobSignatureBucket.job_id)
+        .where(JobSignatureBucket.bucket.in_(band_buckets(signature)))
+        .group_by(JobSignatureBucket.job_id)
+        .order_by(desc(func.count()))
+        .limit(max_candidates)
+    ))
+    if not candidates:
+        return []
+    duplicates = []
+    for stored in db.session.scalars(select(JobSignature).where(JobSignature.job_id.in_(candidates))):
+        score = similarity(signature, unpack(stored.minhash))
+        if score >= threshold:
+            duplicates.append({'job_id': stored.job_id, 'user_id': stored.user_id, 'similarity': round(score, 3)})
+    return sorted(duplicates, key=lambda duplicate: (-duplicate['similarity'], duplicate['job_id']))
+
+
+def _index_rows(jobs):
+    """Signature and bucket rows of ``jobs``"""
+    signatures, buckets = [], []
+    for job in jobs:
+        signature = minhash(job_text(job.title, job.description))
+        signatures.append({'job_id': job.id, 'user_id': job.user_id, 'minhash': pack(signature)})
+        buckets.extend({'job_id': job.id, 'bucket': bucket} for bucket in set(band_buckets(signature)))
+    return signatures, buckets
+
+
+def _write_index(connection, remove_ids, jobs):
+    if remove_ids:
+        connection.execute(delete(JobSignatureBucket.__table__).where(JobSignatureBucket.job_id.in_(remove_ids)))
+        connection.execute(delete(JobSignature.__table__).where(JobSignature.job_id.in_(remove_ids)))
+    signatures, buckets = _index_rows(jobs)
+    if signatures:
+        connection.execute(insert(JobSignature.__table__), signatures)
+        connection.execute(insert(JobSignatureBucket.__table__), buckets)
+
+
+def collect_signature_changes(session, flush_context, instances):
+    """Note the jobs to add to or drop from the signature index: only open jobs are indexed"""
+    if current_app.config['DUPLICATE_JOB_MODE'] == 'off':
+        return
+    index, remove = [], set()
+    for obj in session.new:
+        if isinstance(obj, Job) and (obj.status or 'open') == 'open':
+            index.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Job):
+            remove.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Job) and any(attributes.get_history(obj, key).has_changes()
+                                        for key in ('title', 'description', 'status')):
+            remove.add(obj.id)
+            if obj.status == 'open':
+                index.append(obj)
+    if index or remove:
+        changes = session.info.setdefault('job_signatures', {'index': [], 'remove': set()})
+        changes['index'].extend(index)
+        changes['remove'] |= remove
+
+
+def update_signature_index(session, flush_context):
+    """Write the signatures of the jobs just flushed, now that new jobs have ids"""
+    changes = session.info.pop('job_signatures', None)
+    if changes:
+        _write_index(session.connection(), changes['remove'], changes['index'])
+
+
+def _forget_signature_changes(session):
+    session.info.pop('job_signatures', None)
+
+
+def rebuild_signature_index(batch_size=1000):
+    """Index every open job from scratch, e.g. after turning DUPLICATE_JOB_MODE on. Returns the number indexed"""
+    db.session.execute(delete(JobSignatureBucket.__table__))
+    db.session.execute(delete(JobSignature.__table__))
+    count = 0
+    last_id = 0
+    while True:
+        jobs = merge_shards(Job.query.filter(Job.status == 'open', Job.id > last_id)
+                            .order_by(Job.id).limit(batch_size).all(), Job.id, limit=batch_size)
+        if not jobs:
+            break
+        _write_index(db.session.connection(), (), jobs)
+        count += len(jobs)
+        last_id = jobs[-1].id
+    db.session.commit()
+    return count
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', collect_signature_changes),
+    ('after_flush', update_signature_index),
+    ('after_rollback', _forget_signature_changes),
+)
@@ -0,0 +1,116 @@
+import csv
+import os
+from datetime import date, datetime
+from sqlalchemy import select
+from app.models import User, Job, Quote, Review, Location, DailyRollup, db
+from app.sharding import SHARDED_TABLES, bind_key, shard_ids, sharding_enabled
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow is only needed for Parquet and Arrow exports; CSV works without it
+    pyarrow = None
+
+# Tables written by `flask export-analytics`, the rollups first
+EXPORT_TABLES = {model.__tablename__: model.__table__ for model in (DailyRollup, Job, Quote, Review, User, Location)}
+
+# Columns left out of exports: contact details have no place in offline analysis
+EXCLUDED_COLUMNS = {'users': {'phone', 'phone_e164'}}
+
+FORMATS = ('parquet', 'arrow', 'csv')
+
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def resolve_format(name):
+    """Export format for ``name``; "auto" is Parquet when pyarrow is installed, else CSV"""
+    if name == 'auto':
+        return 'parquet' if pyarrow is not None else 'csv'
+    if name not in FORMATS:
+        raise ValueError(f"format must be one of: auto, {', '.join(FORMATS)}")
+    if name != 'csv' and pyarrow is None:
+        raise ValueError(f'{name} export needs pyarrow (pip install pyarrow), or use csv')
+    return name
+
+
+def _engines(table):
+    """Engines to read ``table`` from: each shard for sharded tables, otherwise the read replica when there is one"""
+    if table.name in SHARDED_TABLES and sharding_enabled():
+        return [db.engines[bind_key(shard)] for shard in shard_ids()]
+    return [db.engines.get('replica', db.engine)]
+
+
+def _batches(table, columns, batch_size):
+    """Rows of ``table`` as lists of dicts, ``batch_size`` at a time, streamed from each engine"""
+    for engine in _engines(table):
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(*columns)
+            )
+            for partition in result.mappings().partitions():
+                yield [dict(row) for row in partition]
+
+
+def _arrow_type(column):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return pyarrow.timestamp('us')
+    if python_type is date:
+        return pyarrow.date32()
+    return {int: pyarrow.int64(), float: pyarrow.float64(), bool: pyarrow.bool_()}.get(python_type, pyarrow.string())
+
+
+def _write_arrow(path, fmt, columns, batches):
+    schema = pyarrow.schema([(column.name, _arrow_type(column)) for column in columns])
+    if fmt == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(path, schema)
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+    count = 0
+    with writer:
+        for rows in batches:
+            writer.write_table(pyarrow.Table.from_pylist(rows, schema=schema))
+            count += len(rows)
+    return count
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _write_csv(path, columns, batches):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([column.name for column in columns])
+        for rows in batches:
+            writer.writerows([_csv_value(value) for value in row.values()] for row in rows)
+            count += len(rows)
+    return count
+
+
+def export_tables(directory, fmt='auto', tables=None, batch_size=10000):
+    """Write the rollups and raw tables to one file per table in ``directory``.
+
+    Rows are streamed ``batch_size`` at a time, so memory stays flat however
+    large the tables are. Returns {table name: (path, rows written)}.
+    """
+    fmt = resolve_format(fmt)
+    names = tables or list(EXPORT_TABLES)
+    unknown = [name for name in names if name not in EXPORT_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}; choose from {', '.join(EXPORT_TABLES)}")
+
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for name in names:
+        table = EXPORT_TABLES[name]
+        columns = [column for column in table.columns if column.name not in EXCLUDED_COLUMNS.get(name, ())]
+        path = os.path.join(directory, name + EXTENSIONS[fmt])
+        batches = _batches(table, columns, batch_size)
+        if fmt == 'csv':
+            written[name] = (path, _write_csv(path, columns, batches))
+        else:
+            written[name] = (path, _write_arrow(path, fmt, columns, batches))
+    return written
@@ -0,0 +1,142 @@
+import threading
+import time
+from sqlalchemy import case, func
+from app.models import Job, Location, db
+
+# Writes to these models change facet counts (a location's path never changes)
+FACETED_MODELS = (Job,)
+
+
+class FacetCache:
+    """Facet counts per filter combination, dropped whenever jobs are written.
+
+    Writes in this process bump a generation counter on commit so stale
+    entries are never served; the TTL bounds staleness from other workers.
+    """
+
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self.generation = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, expires_at, value = entry
+        if generation != self.generation or expires_at < time.monotonic():
+            return None
+        return value
+
+    def set(self, key, value, ttl, generation):
+        """Store a value computed while ``generation`` was current"""
+        with self._lock:
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (generation, time.monotonic() + ttl, value)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+facet_cache = FacetCache()
+
+
+def _track_job_writes(session, flush_context):
+    if any(isinstance(obj, FACETED_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['facets_stale'] = True
+
+
+def _invalidate_facets(session):
+    if session.info.pop('facets_stale', False):
+        facet_cache.invalidate()
+
+
+def _discard_job_writes(session):
+    session.info.pop('facets_stale', None)
+
+
+def budget_bucket(bounds):
+    """SQL expression labelling a job's budget with its bucket, e.g. "1000-5000" """
+    labels = [f'<{bounds[0]}'] + [f'{low}-{high}' for low, high in zip(bounds, bounds[1:])]
+    return case(
+        *[(Job.budget < bound, label) for bound, label in zip(bounds, labels)],
+        else_=f'{bounds[-1]}+'
+    ), labels + [f'{bounds[-1]}+']
+
+
+def location_counts(rows):
+    """Job counts per location path from (location id, count) rows; each area's count includes the areas below it"""
+    counts = {}
+    for location_id, count in rows:
+        if location_id is not None:
+            counts[location_id] = counts.get(location_id, 0) + count
+    if not counts:
+        return {}
+    paths = dict(db.session.query(Location.id, Location.path).filter(Location.id.in_(counts)))
+    facet = {}
+    for location_id, count in counts.items():
+        parts = paths[location_id].split('/')
+        for depth in range(1, len(parts) + 1):
+            path = '/'.join(parts[:depth])
+            facet[path] = facet.get(path, 0) + count
+    return dict(sorted(facet.items()))
+
+
+def compute_facets(filters, bounds):
+    """Count jobs by category, status, location and budget bucket with one grouped query.
+
+    Locations are the hierarchy's paths, so "nairobi" counts every job in
+    Nairobi and "nairobi/westlands" the ones in Westlands: the same
+    subtrees the location filter of the job list matches.
+    """
+    bucket, bucket_labels = budget_bucket(bounds)
+    query = db.session.query(Job.category, Job.status, Job.location_id, bucket, func.count(Job.id))
+
+    if filters.get('status'):
+        query = query.filter(Job.status == filters['status'])
+    if filters.get('category'):
+        query = query.filter(Job.category == filters['category'])
+    if filters.get('user_id'):
+        query = query.filter(Job.user_id == filters['user_id'])
+
+    facets = {
+        'category': {},
+        'status': {},
+        'location': {},
+        'budget': {label: 0 for label in bucket_labels}
+    }
+    rows = query.group_by(Job.category, Job.status, Job.location_id, bucket).all()
+
+    total = 0
+    for category, status, _, budget, count in rows:
+        for name, value in (('category', category), ('status', status), ('budget', budget)):
+            facets[name][value] = facets[name].get(value, 0) + count
+        total += count
+    facets['location'] = location_counts((location_id, count) for _, _, location_id, _, count in rows)
+
+    return {'total': total, 'facets': facets}
+
+
+def get_facets(filters, bounds, ttl):
+    """Facet counts for ``filters``, served from the cache while no job has been written"""
+    key = tuple(sorted((name, value) for name, value in filters.items() if value))
+    result = facet_cache.get(key)
+    if result is None:
+        generation = facet_cache.generation
+        result = compute_facets(filters, bounds)
+        facet_cache.set(key, result, ttl, generation)
+    return result
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('after_flush', _track_job_writes),
+    ('after_commit', _invalidate_facets),
+    ('after_rollback', _discard_job_writes),
+)
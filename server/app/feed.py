@@ -0,0 +1,132 @@
+import threading
+from collections import deque, namedtuple
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.models import Job, db
+from app.schemas import JobResponse
+from app.sharding import merge_shards
+
+# A published job: the pre-serialized JSON payload plus the attributes
+# subscribers filter on, so fan-out never touches the database or pydantic
+FeedEvent = namedtuple('FeedEvent', ['id', 'data', 'category', 'location'])
+
+
+class JobFeed:
+    """In-process fan-out of newly created jobs to Server-Sent Events subscribers.
+
+    A single poller thread per process reads new jobs (``Job.id`` above the
+    high-water mark) in id order and appends them to a bounded ring buffer.
+    Subscribers block on one shared condition and read the buffer from their
+    last seen id, so an idle subscriber holds no queue and no DB connection.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.high_water = None
+        self._events = deque()
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._poller = None
+        self._subscribers = 0
+
+    def init_app(self, app):
+        self.app = app
+        self._events = deque(maxlen=app.config['JOB_STREAM_BUFFER_SIZE'])
+        app.extensions['job_feed'] = self
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def notify(self):
+        """Wake the poller so jobs committed by this process go out immediately"""
+        self._wake.set()
+
+    def subscribe(self):
+        """Register a subscriber and return the id it should start after, or None when this worker is full"""
+        with self._condition:
+            if self._subscribers >= self.app.config['JOB_STREAM_MAX_SUBSCRIBERS']:
+                return None
+            if self.high_water is None:
+                # One row per shard when sharding is on
+                self.high_water = max((high or 0 for high, in db.session.query(func.max(Job.id))), default=0)
+            self._subscribers += 1
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_forever, name='job-feed-poller', daemon=True)
+                self._poller.start()
+            return self.high_water
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def wait(self, last_id, timeout):
+        """Return buffered events newer than ``last_id``, blocking up to ``timeout`` seconds"""
+        with self._condition:
+            if self.high_water is None or self.high_water <= last_id:
+                self._condition.wait(timeout)
+            newer = []
+            for event in reversed(self._events):
+                if event.id <= last_id:
+                    break
+                newer.append(event)
+            newer.reverse()
+            return newer
+
+    def publish(self, jobs):
+        """Append jobs (ordered by id) to the buffer and wake all subscribers"""
+        events = [make_event(job) for job in jobs]
+        with self._condition:
+            for event in events:
+                if event.id > (self.high_water or 0):
+                    self._events.append(event)
+                    self.high_water = event.id
+            self._condition.notify_all()
+
+    def _poll_forever(self):
+        interval = self.app.config['JOB_STREAM_POLL_SECONDS']
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            try:
+                with self.app.app_context():
+                    jobs = (Job.query
+                            .options(selectinload(Job.user), selectinload(Job.location_node))
+                            .filter(Job.id > self.high_water)
+                            .order_by(Job.id)
+                            .limit(self._events.maxlen)
+                            .all())
+                    jobs = merge_shards(jobs, Job.id, limit=self._events.maxlen)
+                    if jobs:
+                        self.publish(jobs)
+            except Exception as e:
+                self.app.logger.warning(f'Job feed poll failed: {str(e)}')
+
+
+def make_event(job):
+    """Serialize a job once for every subscriber"""
+    location = job.location_node.path if job.location_node is not None else ''
+    return FeedEvent(job.id, JobResponse.from_orm(job).json(), job.category, location)
+
+
+def event_matches(event, categories, location):
+    """Check a feed event against a subscriber's categories and location path (matching the areas below it too)"""
+    if categories and event.category not in categories:
+        return False
+    if location and event.location != location and not event.location.startswith(f'{location}/'):
+        return False
+    return True
+
+
+def format_event(event):
+    return f'id: {event.id}\nevent: job\ndata: {event.data}\n\n'
+
+
+def format_resync(last_id):
+    """Final event of a truncated replay: reconnecting with this id as Last-Event-ID replays the rest"""
+    return f'id: {last_id}\nevent: resync\ndata: {{"last_event_id": {last_id}}}\nretry: 0\n\n'
+
+
+job_feed = JobFeed()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, current_app, Response
+from sqlalchemy.exc import IntegrityError
+from app import CustomJSONEncoder
+from app.models import IdempotencyKey, db
+from app.ratelimit import rate_limiter
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+_last_sweep = 0.0
+
+
+def _sha256(data):
+    return hashlib.sha256(data if isinstance(data, bytes) else data.encode()).hexdigest()
+
+
+def claim(digest, request_hash):
+    """Record this request as in flight under ``digest``, or return the row an earlier request left.
+
+    Expired rows are replaced, and in-flight rows older than the lock
+    timeout (their request died) are taken over. The unique digest index
+    makes sure only one of several concurrent duplicates gets to run.
+    """
+    config = current_app.config
+    for _ in range(3):
+        now = datetime.utcnow()
+        row = IdempotencyKey.query.filter_by(digest=digest).first()
+        if row is None:
+            db.session.add(IdempotencyKey(digest=digest, request_hash=request_hash, created_at=now))
+            try:
+                db.session.commit()
+                return None
+            except IntegrityError:
+                # A concurrent duplicate claimed the key first
+                db.session.rollback()
+                continue
+
+        expired = row.created_at < now - timedelta(seconds=config['IDEMPOTENCY_TTL_SECONDS'])
+        abandoned = (row.status_code is None
+                     and row.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS']))
+        if not (expired or abandoned):
+            return row
+
+        # Only one concurrent retry wins the conditional update
+        taken = (IdempotencyKey.query
+                 .filter_by(id=row.id, created_at=row.created_at)
+                 .update({'request_hash': request_hash, 'status_code': None, 'response': None, 'created_at': now},
+                         synchronize_session=False))
+        db.session.commit()
+        if taken:
+            return None
+    raise RuntimeError('Could not claim idempotency key')
+
+
+def store(digest, status_code, data):
+    """Save the response and commit it with the writes of the request that produced it"""
+    (IdempotencyKey.query
+     .filter_by(digest=digest)
+     .update({'status_code': status_code, 'response': json.dumps(data, cls=CustomJSONEncoder)},
+             synchronize_session=False))
+    db.session.commit()
+
+
+def release(digest):
+    """Forget an in-flight key so the request can be retried"""
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(digest=digest, status_code=None).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def sweep_idempotency_keys(ttl):
+    """Delete keys older than ``ttl`` seconds; returns how many were removed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    count = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def _maybe_sweep():
+    """Sweep expired keys at most once per IDEMPOTENCY_SWEEP_SECONDS in each process"""
+    global _last_sweep
+    config = current_app.config
+    if time.monotonic() - _last_sweep >= config['IDEMPOTENCY_SWEEP_SECONDS']:
+        _last_sweep = time.monotonic()
+        sweep_idempotency_keys(config['IDEMPOTENCY_TTL_SECONDS'])
+
+
+def _unpack(result):
+    """(data, status code) of a resource method's return value"""
+    if isinstance(result, tuple):
+        return result[0], result[1] if len(result) > 1 else 200
+    return result, 200
+
+
+def idempotent(method):
+    """Replay the stored response when a POST is retried with the same Idempotency-Key"""
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return method(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return {
+                'success': False,
+                'message': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'
+            }, 400
+
+        # Scoped by the issued API key, which a phone keeps when it retries from a new network. Callers
+        # without one are told apart by address, so they cannot replay each other's responses
+        digest = _sha256('\n'.join((rate_limiter.client_key(), request.method, request.path, key)))
+        request_hash = _sha256(request.get_data())
+        row = claim(digest, request_hash)
+        if row is not None:
+            if row.request_hash != request_hash:
+                return {
+                    'success': False,
+                    'message': f'{HEADER} was already used for a different request'
+                }, 422
+            if row.status_code is None:
+                return {
+                    'success': False,
+                    'message': f'A request with this {HEADER} is still in progress'
+                }, 409, {'Retry-After': '1'}
+            return json.loads(row.response), row.status_code, {'Idempotent-Replayed': 'true'}
+
+        try:
+            # The handler's commits are held back, so its writes and the stored response commit together:
+            # a crash in between cannot leave writes behind for a retry to repeat once it takes the key over
+            db.session.info['hold_commit'] = True
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                db.session.info.pop('hold_commit', None)
+            data, status_code = _unpack(result)
+            if isinstance(data, Response) or status_code >= 500:
+                # Server errors are not final; let the client retry for real
+                release(digest)
+            else:
+                store(digest, status_code, data)
+        except Exception:
+            release(digest)
+            raise
+        _maybe_sweep()
+        return result
+
+    return wrapper
@@ -0,0 +1,83 @@
+import re
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import attributes
+from app.models import Location, User, Job
+from app.sharding import SHARDED_TABLES, MAIN_SHARD, main_values, shard_for_county
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def location_parts(text):
+    """Display names from county down, e.g. "nairobi ,  Westlands" -> ["nairobi", "Westlands"]"""
+    parts = (_WHITESPACE.sub(' ', part.replace('/', ' ')).strip() for part in (text or '').split(','))
+    return [part for part in parts if part]
+
+
+def location_path(text):
+    """Materialized path for a free-text location, e.g. "Nairobi, Westlands" -> "nairobi/westlands" """
+    return '/'.join(part.lower() for part in location_parts(text))
+
+
+def resolve_location(session, text, pending=None):
+    """The Location row for ``text``, adding it and any missing ancestors to the session"""
+    pending = {} if pending is None else pending
+    node = None
+    path = ''
+    for depth, name in enumerate(location_parts(text)):
+        path = f'{path}/{name.lower()}' if path else name.lower()
+        parent = node
+        node = pending.get(path)
+        if node is None:
+            with session.no_autoflush:
+                node = session.query(Location).filter_by(path=path).first()
+        if node is None:
+            node = Location(name=name, path=path, depth=depth, parent=parent)
+            session.add(node)
+        pending[path] = node
+    return node
+
+
+def location_filter(column, text):
+    """Clause matching rows whose ``column`` is the location ``text`` or any area below it.
+
+    The subtree is a range scan on the unique path index: the node itself plus
+    every path between "<path>/" and "<path>0" ("0" sorts right after "/").
+    """
+    path = location_path(text)
+    if not path:
+        raise ValueError('location must not be empty')
+    subtree = select(Location.id).where(or_(
+        Location.path == path,
+        and_(Location.path > f'{path}/', Location.path < f'{path}0')
+    ))
+    return column.in_(main_values(subtree) if column.table.name in SHARDED_TABLES else subtree)
+
+
+def location_shards(text):
+    """Shards that can hold jobs in location ``text``: its county's, and the main database"""
+    county = location_path(text).split('/')[0]
+    return list(dict.fromkeys((shard_for_county(county), MAIN_SHARD)))
+
+
+def assign_locations(session, flush_context, instances):
+    """Link users to the hierarchy when their location text is set, and new jobs to their owner's location"""
+    pending = {}
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, User) and (obj in session.new or attributes.get_history(obj, 'location').has_changes()):
+            obj.location_node = resolve_location(session, obj.location, pending)
+
+    for obj in session.new:
+        if isinstance(obj, Job) and obj.location_id is None and obj.location_node is None:
+            with session.no_autoflush:
+                owner = obj.user or session.get(User, obj.user_id)
+            if owner is not None:
+                if owner.location_id is not None:
+                    obj.location_id = owner.location_id
+                else:
+                    obj.location_node = owner.location_node
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', assign_locations),
+)
@@ -1,9 +1,16 @@
+import os
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Column, Integer, BigInteger, String, Text, Date, DateTime, Float, LargeBinary, ForeignKey, Enum,
+                        Table, Index, UniqueConstraint)
+from sqlalchemy.orm import relationship, validates, column_property
+from app.phone import normalize_phone
+from app.sharding import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Archived rows live in ARCHIVE_DATABASE_URL when it is set, otherwise in the main database
+ARCHIVE_BIND = 'archive' if os.getenv('ARCHIVE_DATABASE_URL') else None
 
 # Association table for many-to-many relationship between users and saved jobs
 saved_jobs = Table('saved_jobs', db.metadata,
@@ -14,16 +21,40 @@ saved_jobs = Table('saved_jobs', db.metadata,
 
 
 
+class Location(db.Model):
+    """Node in the county -> area hierarchy, addressed by a materialized path (e.g., "nairobi/westlands")"""
+    __tablename__ = 'locations'
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, ForeignKey('locations.id'), index=True)
+    name = Column(String(100), nullable=False)  # Display name, e.g. "Westlands"
+    path = Column(String(255), unique=True, nullable=False, index=True)  # Lowercased names joined by "/"
+    depth = Column(Integer, nullable=False, default=0)  # 0 for a county
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    parent = relationship('Location', remote_side=[id])
+
+    def __repr__(self):
+        return f'<Location {self.path}>'
+
 class User(db.Model):
     """User model representing both homeowners and fundis (artisans)"""
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
+    # phone_e164 is the authoritative number: lookups and uniqueness go through it. phone is what is
+    # displayed, written only through the normalizer below, so both hold the same E.164 string (rows
+    # the upgrade could not normalize keep their old phone and a NULL phone_e164 until edited)
     phone = Column(String(20), unique=True, nullable=False)
+    phone_e164 = Column(String(16), unique=True, index=True)
     role = Column(Enum('homeowner', 'fundi', name='user_roles'), nullable=False)
     location = Column(String(100), nullable=False)  # Location in Kenya (e.g., "Nairobi", "Kibera")
+    location_id = Column(Integer, ForeignKey('locations.id'), index=True)  # Resolved from location on flush
+    rating_count = Column(Integer, nullable=False, default=0, server_default='0')  # Maintained from reviews received
+    average_rating = Column(Float, nullable=False, default=0.0, server_default='0')
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     jobs = relationship('Job', back_populates='user', cascade='all, delete-orphan')
@@ -31,6 +62,18 @@ class User(db.Model):
     reviews_given = relationship('Review', foreign_keys='Review.reviewer_id', back_populates='reviewer', cascade='all, delete-orphan')
     reviews_received = relationship('Review', foreign_keys='Review.reviewee_id', back_populates='reviewee', cascade='all, delete-orphan')
     saved_jobs = relationship('Job', secondary=saved_jobs, back_populates='saved_by_users')
+    location_node = relationship('Location')
+
+    # Directory orderings: role filter, then rating or review count, with id as the keyset tiebreaker
+    __table_args__ = (
+        Index('ix_users_role_average_rating', 'role', 'average_rating', 'id'),
+        Index('ix_users_role_rating_count', 'role', 'rating_count', 'id'),
+    )
+
+    @validates('phone')
+    def _sync_phone_e164(self, key, phone):
+        self.phone_e164 = normalize_phone(phone)
+        return self.phone_e164
 
     def __repr__(self):
         return f'<User {self.name} ({self.role})>'
@@ -43,17 +86,36 @@ class Job(db.Model):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=False)
-    category = Column(String(50), nullable=False)  # e.g., "plumbing", "electrical", "painting"
+    # e.g., "plumbing", "electrical", "painting". Category, budget, status and location_id are active_history:
+    # setting one on an expired row loads the stored value first, so the rollups and quote stats can take
+    # the job out of its old bucket
+    category = column_property(Column(String(50), nullable=False), active_history=True)
     preferred_date = Column(DateTime, nullable=False)
-    budget = Column(Float, nullable=False)
-    status = Column(Enum('open', 'closed', name='job_status'), default='open')
+    budget = column_property(Column(Float, nullable=False), active_history=True)
+    status = column_property(Column(Enum('open', 'closed', name='job_status'), default='open'), active_history=True)
+    saved_count = Column(Integer, nullable=False, default=0, server_default='0')  # Maintained by the saved-jobs endpoints
+    # The owner's location when the job was posted
+    location_id = column_property(Column(Integer, ForeignKey('locations.id')), active_history=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     user = relationship('User', back_populates='jobs')
     quotes = relationship('Quote', back_populates='job', cascade='all, delete-orphan')
-    reviews = relationship('Review', back_populates='job', cascade='all, delete-orphan')
+    reviews = relationship('Review', primaryjoin='Job.id == foreign(Review.job_id)',
+                           back_populates='job', cascade='all, delete-orphan')
     saved_by_users = relationship('User', secondary=saved_jobs, back_populates='saved_jobs')
+    location_node = relationship('Location')
+
+    # Composite indexes serving the job feed's filters and sort orders
+    __table_args__ = (
+        Index('ix_jobs_status_created_at', 'status', 'created_at'),
+        Index('ix_jobs_status_budget', 'status', 'budget'),
+        Index('ix_jobs_status_preferred_date', 'status', 'preferred_date'),
+        Index('ix_jobs_category_status_created_at', 'category', 'status', 'created_at'),
+        Index('ix_jobs_location_id_status_created_at', 'location_id', 'status', 'created_at'),
+        Index('ix_jobs_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Job {self.title} - {self.status}>'
@@ -65,14 +127,20 @@ class Quote(db.Model):
     id = Column(Integer, primary_key=True)
     job_id = Column(Integer, ForeignKey('jobs.id'), nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # Fundi providing the quote
-    price = Column(Float, nullable=False)
+    price = column_property(Column(Float, nullable=False), active_history=True)  # As for Job.budget
     message = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     job = relationship('Job', back_populates='quotes')
     fundi = relationship('User', back_populates='quotes')
 
+    __table_args__ = (
+        Index('ix_quotes_job_id_created_at', 'job_id', 'created_at'),
+        Index('ix_quotes_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Quote {self.price} KES for Job {self.job_id}>'
 
@@ -83,16 +151,187 @@ class Review(db.Model):
     id = Column(Integer, primary_key=True)
     reviewer_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # User giving the review
     reviewee_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # User being reviewed
-    rating = Column(Integer, nullable=False)  # 1-5 stars
+    rating = column_property(Column(Integer, nullable=False), active_history=True)  # 1-5 stars; as for Job.budget
     comment = Column(Text)
-    job_id = Column(Integer, ForeignKey('jobs.id'), nullable=False)
+    job_id = Column(Integer, nullable=False)  # Not a foreign key: reviews stay when their job is archived
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     reviewer = relationship('User', foreign_keys=[reviewer_id], back_populates='reviews_given')
     reviewee = relationship('User', foreign_keys=[reviewee_id], back_populates='reviews_received')
-    job = relationship('Job', back_populates='reviews')
+    job = relationship('Job', primaryjoin='foreign(Review.job_id) == Job.id', back_populates='reviews')
+
+    __table_args__ = (
+        Index('ix_reviews_reviewee_id_created_at', 'reviewee_id', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Review {self.rating}/5 from User {self.reviewer_id} to User {self.reviewee_id}>'
 
+class Tombstone(db.Model):
+    """Tombstone recording a deleted row so clients can sync deletions"""
+    __tablename__ = 'tombstones'
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)  # e.g., "jobs", "quotes"
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Tombstone {self.table_name}/{self.row_id}>'
+
+class QuoteStat(db.Model):
+    """Running price summary of the quotes in one scope (a job, category or location)"""
+    __tablename__ = 'quote_stats'
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(200), unique=True, nullable=False)  # e.g., "job:12", "category:plumbing|location:nairobi"
+    quote_count = Column(Integer, nullable=False, default=0)
+    price_total = Column(Float, nullable=False, default=0.0)
+    min_price = Column(Float)  # Exact; NULL when there are no quotes, or until recomputed after an upgrade
+    max_price = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuoteStat {self.scope} ({self.quote_count} quotes)>'
+
+class QuoteStatBucket(db.Model):
+    """Number of quotes in one scope whose price falls in one QuantileSketch bucket"""
+    __tablename__ = 'quote_stat_buckets'
+
+    scope = Column(String(200), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<QuoteStatBucket {self.scope}#{self.bucket} ({self.count})>'
+
+class DailyRollup(db.Model):
+    """Jobs, quotes and reviews created on one day, under one job category, location and job status"""
+    __tablename__ = 'daily_rollups'
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    category = Column(String(50), nullable=False)
+    location = Column(String(255), nullable=False, default='')  # Path of the job's location, e.g. "nairobi/westlands"
+    status = Column(String(20), nullable=False)  # Current status of the job
+    job_count = Column(Integer, nullable=False, default=0)
+    budget_total = Column(Float, nullable=False, default=0.0)
+    quote_count = Column(Integer, nullable=False, default=0)
+    quote_price_total = Column(Float, nullable=False, default=0.0)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_total = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('day', 'category', 'location', 'status', name='uq_daily_rollups_bucket'),
+    )
+
+    def __repr__(self):
+        return f'<DailyRollup {self.day} {self.category} {self.location or "-"} {self.status}>'
+
+class JobSignature(db.Model):
+    """MinHash signature of an open job's title and description, compared to spot reposts"""
+    __tablename__ = 'job_signatures'
+
+    job_id = Column(Integer, primary_key=True, autoincrement=False)  # Not a foreign key: the job may live in a county shard
+    user_id = Column(Integer, nullable=False)
+    minhash = Column(LargeBinary, nullable=False)  # Packed unsigned 64-bit minimums, one per hash function
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<JobSignature for Job {self.job_id}>'
+
+class JobSignatureBucket(db.Model):
+    """LSH band bucket of an open job's signature; jobs sharing a bucket are near-duplicate candidates"""
+    __tablename__ = 'job_signature_buckets'
+
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    bucket = Column(BigInteger, primary_key=True)  # Hash of one band of the signature and the band's number
+
+    __table_args__ = (
+        Index('ix_job_signature_buckets_bucket_job_id', 'bucket', 'job_id'),
+    )
+
+    def __repr__(self):
+        return f'<JobSignatureBucket {self.bucket} of Job {self.job_id}>'
+
+class IdempotencyKey(db.Model):
+    """First response to a POST sent with an Idempotency-Key, replayed to retries"""
+    __tablename__ = 'idempotency_keys'
+
+    id = Column(Integer, primary_key=True)
+    digest = Column(String(64), unique=True, nullable=False)  # sha256 of client, method, path and key
+    request_hash = Column(String(64), nullable=False)  # sha256 of the request body
+    status_code = Column(Integer)  # NULL while the first request is still in flight
+    response = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.digest[:12]} ({self.status_code or "in flight"})>'
+
+class ShardSequence(db.Model):
+    """Next id of a sharded table, so rows get ids unique across the county shards"""
+    __tablename__ = 'shard_sequences'
+
+    table_name = Column(String(50), primary_key=True)  # e.g. "jobs"
+    next_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ShardSequence {self.table_name} at {self.next_id}>'
+
+class ArchivedJob(db.Model):
+    """Closed job moved out of the hot jobs table by `flask archive-jobs`"""
+    __tablename__ = 'jobs_archive'
+    __bind_key__ = ARCHIVE_BIND
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Same id as in jobs
+    user_id = Column(Integer, nullable=False)
+    title = Column(String(200), nullable=False)
+    description = Column(Text, nullable=False)
+    category = Column(String(50), nullable=False)
+    preferred_date = Column(DateTime, nullable=False)
+    budget = Column(Float, nullable=False)
+    status = Column(String(20), nullable=False)
+    saved_count = Column(Integer, nullable=False, default=0)
+    location_id = Column(Integer)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def user(self):
+        return db.session.get(User, self.user_id)
+
+    def __repr__(self):
+        return f'<ArchivedJob {self.title}>'
+
+class ArchivedQuote(db.Model):
+    """Quote archived together with its job"""
+    __tablename__ = 'quotes_archive'
+    __bind_key__ = ARCHIVE_BIND
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Same id as in quotes
+    job_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+    message = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_quotes_archive_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    @property
+    def job(self):
+        return db.session.get(ArchivedJob, self.job_id)
+
+    @property
+    def fundi(self):
+        return db.session.get(User, self.user_id)
+
+    def __repr__(self):
+        return f'<ArchivedQuote {self.price} KES for Job {self.job_id}>'
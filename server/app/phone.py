@@ -0,0 +1,28 @@
+import re
+
+DEFAULT_COUNTRY_CODE = '254'  # Kenya
+
+_SEPARATORS = re.compile(r'[\s\-().]')
+_E164 = re.compile(r'^\+[1-9]\d{7,14}$')
+
+
+def normalize_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """Canonical E.164 form of a phone number, e.g. "0712 345 678" -> "+254712345678".
+
+    Numbers without a country code are taken to be local (trunk prefix 0, or
+    the bare 9-digit subscriber number). Raises ValueError if the result is
+    not a valid E.164 number.
+    """
+    number = _SEPARATORS.sub('', phone or '')
+    if number.startswith('00'):
+        number = '+' + number[2:]
+    elif number.startswith('0'):
+        number = f'+{country_code}{number[1:]}'
+    elif number.startswith(country_code) and len(number) > 9:
+        number = '+' + number
+    elif not number.startswith('+') and len(number) == 9:
+        number = f'+{country_code}{number}'
+
+    if not _E164.match(number):
+        raise ValueError(f'Invalid phone number: {phone!r}')
+    return number
@@ -0,0 +1,251 @@
+from datetime import datetime
+from sqlalchemy import select, update, case, func, null, and_, or_, bindparam
+from sqlalchemy.orm import attributes
+from app.models import Quote, QuoteStat, QuoteStatBucket, Job, Location, db
+from app.counters import add_to_rows
+from app.locations import location_filter, location_path
+from app.sharding import MAIN_SHARD
+from app.sketch import QuantileSketch
+
+# Buckets of the quantile sketch, kept as counter rows so that writers only ever add to them
+SKETCH = QuantileSketch()
+
+
+def location_keys(path):
+    """Location scopes of a job at ``path``: the path and each of its ancestors, e.g. "nairobi/westlands", "nairobi" """
+    parts = path.split('/') if path else []
+    return ['/'.join(parts[:depth]) for depth in range(len(parts), 0, -1)]
+
+
+def stats_scope(job_id=None, category=None, location=None):
+    """Key of the summary row for a job, or for a category and/or location"""
+    if job_id is not None:
+        return f'job:{job_id}'
+    parts = []
+    if category:
+        parts.append(f'category:{category.lower()}')
+    if location:
+        parts.append(f'location:{location_path(location)}')
+    return '|'.join(parts) or 'all'
+
+
+def quote_scopes(job_id, category, path):
+    """Every summary a quote on job ``job_id``, at location ``path``, contributes to"""
+    scopes = [stats_scope(job_id=job_id), 'all', stats_scope(category=category)]
+    for key in location_keys(path):
+        scopes.append(f'location:{key}')
+        scopes.append(f'category:{category.lower()}|location:{key}')
+    return scopes
+
+
+def _committed(obj, key):
+    """Value of ``key`` as last loaded from the database"""
+    history = attributes.get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    return (history.unchanged or history.added or [None])[0]
+
+
+def _job_location(session, job, committed=False):
+    """Location path of ``job``, as stored or as last loaded"""
+    location_id = _committed(job, 'location_id') if committed else job.location_id
+    if location_id is None:
+        # A new job's location is linked on the flush that inserts it
+        node = None if committed else job.location_node
+        return node.path if node is not None else ''
+    return session.get(Location, location_id).path
+
+
+def collect_quote_stat_changes(session, flush_context, instances):
+    """Note the quote inserts, price edits and deletes to fold into the running summaries"""
+    changes = []  # (scopes, price, weight)
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Quote):
+                job = session.get(Job, obj.job_id)
+                if job is not None:
+                    changes.append((quote_scopes(job.id, job.category, _job_location(session, job)), obj.price, 1))
+
+        for obj in session.deleted:
+            if isinstance(obj, Quote):
+                job = session.get(Job, _committed(obj, 'job_id'))
+                if job is not None:
+                    scopes = quote_scopes(job.id, _committed(job, 'category'),
+                                          _job_location(session, job, committed=True))
+                    changes.append((scopes, _committed(obj, 'price'), -1))
+
+        for obj in session.dirty:
+            if isinstance(obj, Quote) and attributes.get_history(obj, 'price').has_changes():
+                job = session.get(Job, obj.job_id)
+                if job is not None:
+                    scopes = quote_scopes(job.id, job.category, _job_location(session, job))
+                    changes.append((scopes, _committed(obj, 'price'), -1))
+                    changes.append((scopes, obj.price, 1))
+            elif isinstance(obj, Job) and any(attributes.get_history(obj, key).has_changes()
+                                              for key in ('category', 'location_id')):
+                # Move the job's quotes from the old category's or location's summaries to the new ones
+                old_scopes = quote_scopes(obj.id, _committed(obj, 'category'),
+                                          _job_location(session, obj, committed=True))
+                new_scopes = quote_scopes(obj.id, obj.category, _job_location(session, obj))
+                for quote in obj.quotes:
+                    if quote not in session.new and quote not in session.deleted:
+                        changes.append((old_scopes, _committed(quote, 'price'), -1))
+                        changes.append((new_scopes, _committed(quote, 'price'), 1))
+
+    if changes:
+        session.info.setdefault('quote_stats', []).extend(changes)
+
+
+def update_quote_stats(session, flush_context):
+    """Apply the collected changes once the quotes are written, so extremes can be recomputed from them"""
+    changes = session.info.pop('quote_stats', None)
+    if changes:
+        apply_changes(session, changes)
+
+
+def _forget_quote_stat_changes(session):
+    session.info.pop('quote_stats', None)
+
+
+def _extremes(table, excluded):
+    """SET clause of min_price and max_price: extremes widen as prices are added, and unknown ones stay unknown"""
+    values = {}
+    for column, wider in (('min_price', excluded.min_price < table.c.min_price),
+                          ('max_price', excluded.max_price > table.c.max_price)):
+        stored, added = table.c[column], excluded[column]
+        values[column] = case(
+            (added.is_(None), stored),
+            (and_(stored.is_(None), table.c.quote_count > 0), null()),
+            (or_(stored.is_(None), wider), added),
+            else_=stored
+        )
+    values['updated_at'] = excluded.updated_at
+    return values
+
+
+def apply_changes(session, changes):
+    """Add ``changes`` onto the summary and sketch bucket rows they touch.
+
+    Counts, totals and bucket counts are upserted as increments, so
+    concurrent quote writes never wait on a read of the same rows and never
+    race to create one. Taking a quote out can remove a scope's lowest or
+    highest price, which no increment undoes: those extremes are recomputed
+    from the quotes, which is rare and only touches the scopes concerned.
+    """
+    now = datetime.utcnow()
+    stats, buckets, removed = {}, {}, {}
+    for change_scopes, price, weight in changes:
+        bucket = SKETCH.bucket(price)
+        for scope in change_scopes:
+            stat = stats.setdefault(scope, {'scope': scope, 'quote_count': 0, 'price_total': 0.0,
+                                            'min_price': None, 'max_price': None, 'updated_at': now})
+            stat['quote_count'] += weight
+            stat['price_total'] += price * weight
+            if weight > 0:
+                stat['min_price'] = price if stat['min_price'] is None else min(stat['min_price'], price)
+                stat['max_price'] = price if stat['max_price'] is None else max(stat['max_price'], price)
+            else:
+                removed.setdefault(scope, []).append(price)
+            if bucket is not None:
+                buckets[scope, bucket] = buckets.get((scope, bucket), 0) + weight
+
+    main = session.connection(bind_arguments={'shard': MAIN_SHARD})
+    add_to_rows(main, QuoteStat.__table__, ['scope'], list(stats.values()), assign=_extremes)
+    add_to_rows(main, QuoteStatBucket.__table__, ['scope', 'bucket'],
+                [{'scope': scope, 'bucket': bucket, 'count': count}
+                 for (scope, bucket), count in buckets.items() if count])
+    if removed:
+        _recompute_extremes(session, main, removed)
+
+
+def _recompute_extremes(session, main, removed):
+    """Recompute the extremes of the scopes that had one of ``removed`` ({scope: [prices]}) taken out"""
+    table = QuoteStat.__table__
+    stale = []
+    for scope, count, low, high in main.execute(select(table.c.scope, table.c.quote_count, table.c.min_price,
+                                                       table.c.max_price).where(table.c.scope.in_(removed))):
+        prices = removed[scope]
+        if count <= 0:
+            stale.append({'key': scope, 'low': None, 'high': None})
+        elif low is not None and high is not None and min(prices) > low and max(prices) < high:
+            continue
+        else:
+            low, high = scope_extremes(session, scope)
+            stale.append({'key': scope, 'low': low, 'high': high})
+    if stale:
+        main.execute(update(table).where(table.c.scope == bindparam('key'))
+                     .values(min_price=bindparam('low'), max_price=bindparam('high')), stale)
+
+
+def scope_extremes(session, scope):
+    """Exact (lowest, highest) price of the quotes in ``scope``, from the quotes table"""
+    query = select(func.min(Quote.price), func.max(Quote.price)).join(Job, Quote.job_id == Job.id)
+    for part in scope.split('|'):
+        name, _, value = part.partition(':')
+        if name == 'job':
+            query = query.where(Quote.job_id == int(value))
+        elif name == 'category':
+            query = query.where(func.lower(Job.category) == value)
+        elif name == 'location':
+            # A location key covers its whole subtree, as every quote counts towards each ancestor
+            query = query.where(location_filter(Job.location_id, value))
+    # One row per shard when jobs are sharded
+    rows = session.execute(query).all()
+    lows = [low for low, _ in rows if low is not None]
+    highs = [high for _, high in rows if high is not None]
+    return (min(lows) if lows else None), (max(highs) if highs else None)
+
+
+def summarize(stat):
+    """Price summary served by the stats endpoint"""
+    if stat is None or stat.quote_count <= 0:
+        return {'count': 0, 'min': None, 'median': None, 'p90': None, 'mean': None, 'max': None}
+    buckets = dict(db.session.query(QuoteStatBucket.bucket, QuoteStatBucket.count)
+                   .filter(QuoteStatBucket.scope == stat.scope, QuoteStatBucket.count > 0))
+    sketch = QuantileSketch(buckets=buckets, zero_count=max(0, stat.quote_count - sum(buckets.values())))
+    low, high = stat.min_price, stat.max_price
+    if low is None or high is None:
+        # Not recomputed since the upgrade that added the columns (flask rebuild-quote-stats fills them in)
+        low, high = scope_extremes(db.session, stat.scope)
+    return {
+        'count': stat.quote_count,
+        'min': low,
+        'median': _clamp(sketch.quantile(0.5), low, high),
+        'p90': _clamp(sketch.quantile(0.9), low, high),
+        'mean': stat.price_total / stat.quote_count,
+        'max': high
+    }
+
+
+def _clamp(value, low, high):
+    """A sketch quantile (a bucket's representative value) held within the exact price range"""
+    if value is None or low is None or high is None:
+        return value
+    return min(max(value, low), high)
+
+
+def rebuild_quote_stats():
+    """Recompute every summary from the quotes table (repairs drift, e.g. after a sharded upgrade)"""
+    QuoteStatBucket.query.delete()
+    QuoteStat.query.delete()
+    changes = []
+    # Location paths are looked up separately, as the quotes and jobs may live in a county shard
+    quotes = (db.session.query(Quote.price, Job.id, Job.category, Job.location_id)
+              .join(Job, Quote.job_id == Job.id)
+              .all())
+    paths = dict(db.session.query(Location.id, Location.path).filter(Location.id.in_({row[3] for row in quotes})))
+    for price, job_id, category, location_id in quotes:
+        changes.append((quote_scopes(job_id, category, paths.get(location_id, '')), price, 1))
+    if changes:
+        apply_changes(db.session, changes)
+    db.session.commit()
+    return len(changes)
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', collect_quote_stat_changes),
+    ('after_flush', update_quote_stats),
+    ('after_rollback', _forget_quote_stat_changes),
+)
@@ -0,0 +1,187 @@
+import math
+import threading
+import time
+from flask import request, g
+
+try:
+    import redis
+except ImportError:  # redis is only needed for the shared multi-worker backend
+    redis = None
+
+# List endpoints whose unfiltered form serializes a whole table, with the query parameters that narrow
+# their rows. Anything else (fields, sort, saved_by, cache busters like _=1) leaves the whole table
+LIST_FILTERS = {
+    'joblistresource': {'ids', 'status', 'category', 'user_id', 'location', 'budget_min', 'budget_max',
+                        'date_from', 'date_to'},
+    'userlistresource': {'ids', 'role', 'location', 'limit', 'cursor'},
+    'quotelistresource': {'ids', 'job_id', 'user_id'},
+    'reviewlistresource': {'ids', 'user_id'},
+}
+
+EXEMPT_PATHS = {'/', '/health', '/ready'}
+
+
+class MemoryBackend:
+    """Token buckets held in this process; each worker limits independently"""
+
+    SWEEP_INTERVAL = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def consume(self, key, cost, rate, burst):
+        """Take ``cost`` tokens from the bucket; return (allowed, remaining, retry_after)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+
+            self._calls += 1
+            if self._calls % self.SWEEP_INTERVAL == 0:
+                self._sweep(now, rate, burst)
+
+        retry_after = 0 if allowed else (cost - tokens) / rate
+        return allowed, tokens, retry_after
+
+    def _sweep(self, now, rate, burst):
+        """Forget buckets that have refilled completely; they are equivalent to new ones"""
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+class RedisBackend:
+    """Token buckets in a Redis-protocol store, shared by every worker and host"""
+
+    # Refill and take tokens atomically; buckets expire once they would be full again
+    SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'updated'))
+    local cost, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    if tokens == nil then
+        tokens, updated = burst, now
+    end
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        if redis is None:
+            raise RuntimeError('The redis package is required for a redis:// RATELIMIT_STORAGE_URL')
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def consume(self, key, cost, rate, burst):
+        allowed, tokens = self._script(keys=[self._prefix + key], args=[cost, rate, burst])
+        tokens = float(tokens)
+        retry_after = 0 if allowed else (cost - tokens) / rate
+        return bool(allowed), tokens, retry_after
+
+
+def create_backend(url):
+    """Build a backend from RATELIMIT_STORAGE_URL (memory:// or redis://...)"""
+    if url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f'Unsupported RATELIMIT_STORAGE_URL: {url}')
+
+
+class RateLimiter:
+    """Per-client token bucket limiting with per-endpoint request costs"""
+
+    def __init__(self):
+        self.backend = None
+        self.app = None
+        self.cost_functions = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.backend = create_backend(app.config['RATELIMIT_STORAGE_URL'])
+        app.extensions['rate_limiter'] = self
+        app.before_request(self._check_request)
+        app.after_request(self._add_headers)
+
+    def api_key(self):
+        """The X-API-Key sent with the request when it is one of the issued API_KEYS, otherwise None"""
+        api_key = request.headers.get('X-API-Key')
+        if api_key and api_key in self.app.config['API_KEYS']:
+            return api_key
+        return None
+
+    def client_key(self):
+        """Bucket key: an issued API key when one is sent, otherwise the client address.
+
+        Unknown keys count against the address, so inventing a new key for
+        every request does not get a fresh bucket.
+        """
+        api_key = self.api_key()
+        if api_key:
+            return f'key:{api_key}'
+        return f'ip:{request.remote_addr}'
+
+    def register_cost(self, endpoint, function):
+        """Price requests to ``endpoint`` with ``function(limiter)``, called during the request"""
+        self.cost_functions[endpoint] = function
+
+    def cost(self, endpoint, method, args):
+        """Tokens a request costs; unfiltered list calls and writes cost more"""
+        config = self.app.config
+        if endpoint in self.cost_functions:
+            return self.cost_functions[endpoint](self)
+        if endpoint in config['RATELIMIT_ENDPOINT_COSTS']:
+            return config['RATELIMIT_ENDPOINT_COSTS'][endpoint]
+        if method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+            return config['RATELIMIT_WRITE_COST']
+        if endpoint in LIST_FILTERS and not any(args.get(name) for name in LIST_FILTERS[endpoint]):
+            # Empty values (?status=) filter nothing either
+            return config['RATELIMIT_UNFILTERED_LIST_COST']
+        return 1
+
+    def consume(self, key, cost):
+        config = self.app.config
+        return self.backend.consume(key, cost, config['RATELIMIT_RATE'], config['RATELIMIT_BURST'])
+
+    def _check_request(self):
+        if (not self.app.config['RATELIMIT_ENABLED']
+                or request.method == 'OPTIONS'
+                or request.path in EXEMPT_PATHS
+                or request.endpoint is None):
+            return None
+
+        cost = self.cost(request.endpoint, request.method, request.args)
+        allowed, remaining, retry_after = self.consume(self.client_key(), cost)
+        g.rate_limit_remaining = remaining
+        if not allowed:
+            return {
+                'success': False,
+                'message': 'Rate limit exceeded, please retry later'
+            }, 429, {'Retry-After': str(math.ceil(retry_after))}
+        return None
+
+    def _add_headers(self, response):
+        remaining = g.pop('rate_limit_remaining', None)
+        if remaining is not None:
+            response.headers['X-RateLimit-Limit'] = str(self.app.config['RATELIMIT_BURST'])
+            response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+        return response
+
+
+rate_limiter = RateLimiter()
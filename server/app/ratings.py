@@ -0,0 +1,85 @@
+from sqlalchemy import select, update, func, bindparam
+from sqlalchemy.orm import attributes
+from app.models import User, Review
+from app.cache import invalidate
+from app.sharding import sharding_enabled
+
+
+def rating_updates(user_ids):
+    """UPDATE recomputing the precomputed rating columns of ``user_ids`` from their reviews"""
+    received = Review.__table__.c.reviewee_id == User.__table__.c.id
+    return (update(User.__table__)
+            .where(User.__table__.c.id.in_(user_ids))
+            .values(
+                rating_count=select(func.count(Review.__table__.c.id)).where(received).scalar_subquery(),
+                average_rating=select(func.coalesce(func.avg(Review.__table__.c.rating), 0.0))
+                .where(received).scalar_subquery()
+            ))
+
+
+def sharded_rating_updates(session, user_ids):
+    """Rating column values of ``user_ids`` summed over every shard's reviews, with the UPDATE that sets them"""
+    totals = {user_id: [0, 0] for user_id in user_ids}
+    rows = session.execute(select(Review.reviewee_id, func.count(Review.id), func.coalesce(func.sum(Review.rating), 0))
+                           .where(Review.reviewee_id.in_(user_ids))
+                           .group_by(Review.reviewee_id))
+    for user_id, count, rating_total in rows:
+        totals[user_id][0] += count
+        totals[user_id][1] += rating_total
+    statement = (update(User.__table__)
+                 .where(User.__table__.c.id == bindparam('user_id'))
+                 .values(rating_count=bindparam('count'), average_rating=bindparam('average')))
+    return statement, [
+        {'user_id': user_id, 'count': count, 'average': rating_total / count if count else 0.0}
+        for user_id, (count, rating_total) in totals.items()
+    ]
+
+
+def _reviewees(obj):
+    """Users whose rating a new, edited or deleted review affects (before and after the change)"""
+    history = attributes.get_history(obj, 'reviewee_id')
+    return {user_id for user_id in (*history.deleted, *history.unchanged, *history.added) if user_id is not None}
+
+
+def collect_rated_users(session, flush_context, instances):
+    """Note the reviewees whose ratings change in this flush"""
+    rated = set()
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Review):
+            rated |= _reviewees(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Review) and (attributes.get_history(obj, 'rating').has_changes()
+                                        or attributes.get_history(obj, 'reviewee_id').has_changes()):
+            rated |= _reviewees(obj)
+    if rated:
+        session.info.setdefault('rated_users', set()).update(rated)
+
+
+def refresh_ratings(session, flush_context):
+    """Recompute rating columns once the reviews are written, with one indexed UPDATE"""
+    rated = session.info.pop('rated_users', None)
+    if not rated:
+        return
+    if sharding_enabled():
+        # Reviews are spread over the county shards, so the UPDATE cannot read them itself
+        session.connection().execute(*sharded_rating_updates(session, rated))
+    else:
+        session.connection().execute(rating_updates(rated))
+    for user_id in rated:
+        user = session.identity_map.get(session.identity_key(User, user_id))
+        if user is not None:
+            session.expire(user, ['rating_count', 'average_rating', 'updated_at'])
+    # The UPDATE bypasses the flush hooks that keep cached rows fresh
+    invalidate(User, rated)
+
+
+def _forget_rated_users(session):
+    session.info.pop('rated_users', None)
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', collect_rated_users),
+    ('after_flush', refresh_ratings),
+    ('after_rollback', _forget_rated_users),
+)
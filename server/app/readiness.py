@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from app.models import db
+
+# Seconds since the last transaction replayed on a PostgreSQL standby (NULL on a primary)
+REPLICA_LAG_SQL = text(
+    'SELECT CASE WHEN pg_is_in_recovery() '
+    'THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def pool_stats(pool):
+    """Checked-out and overflow connection counts of a connection pool"""
+    if not hasattr(pool, 'checkedout'):
+        # SQLite's in-memory and single-connection pools keep no counts
+        return {'class': type(pool).__name__}
+    size = pool.size()
+    max_overflow = getattr(pool, '_max_overflow', -1)
+    checked_out = pool.checkedout()
+    return {
+        'class': type(pool).__name__,
+        'size': size,
+        'checked_out': checked_out,
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': max_overflow,
+        'exhausted': max_overflow >= 0 and checked_out >= size + max_overflow
+    }
+
+
+def ping(engines):
+    """Round-trip time of SELECT 1 on each engine, and the lag of a configured replica"""
+    results = {}
+    for key, engine in engines.items():
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                result = {'ok': True, 'ping_ms': round((time.perf_counter() - start) * 1000, 2)}
+                if key == 'replica' and engine.dialect.name == 'postgresql':
+                    lag = connection.execute(REPLICA_LAG_SQL).scalar()
+                    result['lag_seconds'] = round(float(lag), 3) if lag is not None else None
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        results[key] = result
+    return results
+
+
+class ReadinessProbe:
+    """Deep readiness check of this worker: database pings, pool usage, query latency and replica lag.
+
+    Results are reused for READY_CACHE_SECONDS so load balancer probes
+    cannot become load themselves. Pings run on one background thread, so
+    a database that hangs costs a probe READY_DB_TIMEOUT_SECONDS rather
+    than a worker thread.
+    """
+
+    def __init__(self):
+        self.samples = deque(maxlen=1000)  # Durations of recent queries, in seconds
+        self._result = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ready-ping')
+
+    def init_app(self, app):
+        self.samples = deque(maxlen=app.config['READY_LATENCY_WINDOW'])
+        app.extensions['readiness'] = self
+
+    def latency(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {'samples': 0, 'p50_ms': None, 'p95_ms': None}
+        return {
+            'samples': len(samples),
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 2),
+            'p95_ms': round(samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000, 2)
+        }
+
+    def check(self):
+        """(report, ready), recomputed at most once per READY_CACHE_SECONDS"""
+        if self._result is not None and time.monotonic() < self._expires:
+            return self._result
+        # One request refreshes the result; concurrent probes keep getting the previous one
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if self._result is None or time.monotonic() >= self._expires:
+                self._result = self._probe(current_app.config)
+                self._expires = time.monotonic() + current_app.config['READY_CACHE_SECONDS']
+            return self._result
+        finally:
+            self._lock.release()
+
+    def _probe(self, config):
+        engines = dict(db.engines)
+        pools = {key: pool_stats(engine.pool) for key, engine in engines.items()}
+        try:
+            pings = self._executor.submit(ping, engines).result(timeout=config['READY_DB_TIMEOUT_SECONDS'])
+        except TimeoutError:
+            pings = {key: {'ok': False, 'error': f"no reply within {config['READY_DB_TIMEOUT_SECONDS']:g}s"}
+                     for key in engines}
+
+        problems = []
+        databases = {}
+        for key in engines:
+            name = key or 'default'
+            databases[name] = {**pings[key], 'pool': pools[key]}
+            if not pings[key]['ok']:
+                problems.append(f"{name} database ping failed: {pings[key]['error']}")
+            if pools[key].get('exhausted'):
+                problems.append(f'{name} connection pool exhausted')
+
+        latency = self.latency()
+        max_p95 = config['READY_MAX_QUERY_P95_MS']
+        if max_p95 and latency['p95_ms'] is not None and latency['p95_ms'] > max_p95:
+            problems.append(f"query p95 {latency['p95_ms']}ms is over {max_p95:g}ms")
+
+        lag = pings.get('replica', {}).get('lag_seconds')
+        max_lag = config['READY_MAX_REPLICA_LAG_SECONDS']
+        if max_lag and lag is not None and lag > max_lag:
+            problems.append(f'replica lag {lag}s is over {max_lag:g}s')
+
+        report = {
+            'status': 'unavailable' if problems else 'ready',
+            'checked_at': datetime.utcnow().isoformat(),
+            'databases': databases,
+            'query_latency': latency,
+            'replica_lag_seconds': lag,
+            'problems': problems
+        }
+        return report, not problems
+
+
+readiness = ReadinessProbe()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started:
+        readiness.samples.append(time.perf_counter() - started.pop())
@@ -0,0 +1,39 @@
+from flask import request, current_app
+from flask_restful import Resource
+from app.batch import parse_batch, run_batch, batch_cost, check_cost
+from app.ratelimit import rate_limiter
+
+# A batch is charged what its sub-requests would cost separately
+rate_limiter.register_cost('batchresource', batch_cost)
+
+class BatchResource(Resource):
+    """Resource for running several API requests in one round trip"""
+
+    def post(self):
+        """Run a list of sub-requests and return every result"""
+        try:
+            payload = request.get_json(silent=True)
+            requests = parse_batch(payload, current_app.config['BATCH_MAX_REQUESTS'])
+            parallel = bool(payload.get('parallel', False))
+            if parallel and any(method != 'GET' for method, _, _, _ in requests):
+                raise ValueError('parallel batches may only contain GET requests')
+            check_cost(rate_limiter, requests)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': 'Validation error',
+                'errors': str(e)
+            }, 400
+
+        try:
+            responses = run_batch(requests, parallel=parallel)
+            return {
+                'success': True,
+                'responses': responses,
+                'count': len(responses)
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error running batch: {str(e)}'
+            }, 500
@@ -1,21 +1,89 @@
-from flask import request
+from flask import request, current_app, Response
 from flask_restful import Resource
+from datetime import datetime
 from sqlalchemy import desc
-from app.models import Job, User, db
+from sqlalchemy.orm import selectinload
+from app.models import Job, User, ArchivedJob, db
 from app.schemas import JobCreate, JobUpdate, JobResponse
+from app.feed import job_feed, make_event, event_matches, format_event, format_resync
+from app.serialization import parse_projection, render, render_list, render_many, load_options
+from app.facets import get_facets
+from app.saved_jobs import mark_saved
+from app.cache import get_user, get_job
+from app.locations import location_filter, location_shards, location_path
+from app.sharding import merge_shards
+from app.archive import find_archived
+from app.idempotency import idempotent
+from app.duplicates import find_duplicates
+
+# Sort orders for job listings; each is served by one of the composite indexes on Job
+JOB_SORTS = {
+    'newest': (desc(Job.created_at), desc(Job.id)),
+    'budget': (Job.budget, Job.id),
+    '-budget': (desc(Job.budget), desc(Job.id)),
+    'preferred_date': (Job.preferred_date, Job.id),
+}
+
+def parse_range(args, name, parse):
+    """Parse an optional range bound, raising ValueError with the parameter name"""
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        raise ValueError(f'Invalid value for {name}: {value}')
 
 class JobListResource(Resource):
     """Resource for listing and creating jobs"""
+    method_decorators = {'post': [idempotent]}
 
     def get(self):
         """Get all jobs"""
         try:
+            # Flag the jobs the viewing user has saved
+            saved_by = request.args.get('saved_by', type=int)
+            flag_saved = (lambda jobs: mark_saved(jobs, saved_by)) if saved_by else None
+
+            if 'ids' in request.args:
+                try:
+                    payload = render_many(Job, JobResponse, request.args, current_app.config['MULTI_GET_MAX_IDS'],
+                                          prepare=flag_saved)
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'message': 'Validation error',
+                        'errors': str(e)
+                    }, 400
+                return {
+                    'success': True,
+                    **payload
+                }, 200
+
             # Get query parameters for filtering
             status = request.args.get('status')
             category = request.args.get('category')
             user_id = request.args.get('user_id')
+            location = request.args.get('location')
+            sort = request.args.get('sort', 'newest')
 
-            query = Job.query
+            try:
+                budget_min = parse_range(request.args, 'budget_min', float)
+                budget_max = parse_range(request.args, 'budget_max', float)
+                date_from = parse_range(request.args, 'date_from', datetime.fromisoformat)
+                date_to = parse_range(request.args, 'date_to', datetime.fromisoformat)
+                if sort not in JOB_SORTS:
+                    raise ValueError(f"sort must be one of: {', '.join(JOB_SORTS)}")
+                location_clause = location_filter(Job.location_id, location) if location is not None else None
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': str(e)
+                }, 400
+
+            projection = parse_projection(request.args)
+            query = Job.query.options(*load_options(Job, JobResponse, projection))
 
             if status:
                 query = query.filter_by(status=status)
@@ -23,15 +91,26 @@ class JobListResource(Resource):
                 query = query.filter_by(category=category)
             if user_id:
                 query = query.filter_by(user_id=user_id)
+            if location_clause is not None:
+                query = query.filter(location_clause).execution_options(shards=location_shards(location))
+            if budget_min is not None:
+                query = query.filter(Job.budget >= budget_min)
+            if budget_max is not None:
+                query = query.filter(Job.budget <= budget_max)
+            if date_from is not None:
+                query = query.filter(Job.preferred_date >= date_from)
+            if date_to is not None:
+                query = query.filter(Job.preferred_date <= date_to)
+
+            # Newest first unless another sort order is requested
+            jobs = merge_shards(query.order_by(*JOB_SORTS[sort]).all(), *JOB_SORTS[sort])
 
-            # Order by creation date (newest first)
-            jobs = query.order_by(desc(Job.created_at)).all()
+            if flag_saved:
+                flag_saved(jobs)
 
-            schema = JobResponse
             return {
                 'success': True,
-                'data': [schema.model_validate(job) for job in jobs],
-                'count': len(jobs)
+                **render_list(jobs, JobResponse, projection)
             }, 200
         except Exception as e:
             return {
@@ -45,7 +124,7 @@ class JobListResource(Resource):
             schema = JobCreate(**request.get_json())
 
             # Verify that the user exists
-            user = User.query.get(schema.user_id)
+            user = get_user(schema.user_id)
             if not user:
                 return {
                     'success': False,
@@ -59,22 +138,40 @@ class JobListResource(Resource):
                     'message': 'Only homeowners can post jobs'
                 }, 403
 
+            # Look for open jobs this one nearly repeats; strict mode refuses a homeowner's own reposts
+            mode = current_app.config['DUPLICATE_JOB_MODE']
+            duplicates = []
+            if mode != 'off':
+                duplicates = find_duplicates(schema.title, schema.description,
+                                             current_app.config['DUPLICATE_JOB_THRESHOLD'],
+                                             current_app.config['DUPLICATE_JOB_MAX_CANDIDATES'])
+                if mode == 'strict' and any(duplicate['user_id'] == user.id for duplicate in duplicates):
+                    return {
+                        'success': False,
+                        'message': 'You already have an open job like this one',
+                        'duplicates': duplicates
+                    }, 409
+
             job = Job(
                 user_id=schema.user_id,
                 title=schema.title,
                 description=schema.description,
                 category=schema.category,
                 preferred_date=schema.preferred_date,
-                budget=schema.budget
+                budget=schema.budget,
+                location_id=user.location_id
             )
             db.session.add(job)
             db.session.commit()
 
-            response_schema = JobResponse.model_validate(job)
+            # Push the new job to stream subscribers
+            job_feed.notify()
+
             return {
                 'success': True,
                 'message': 'Job created successfully',
-                'data': response_schema.model_dump()
+                'data': render(job, JobResponse, parse_projection(request.args)),
+                **({'duplicates': duplicates} if mode != 'off' else {})
             }, 201
 
         except ValueError as e:
@@ -90,17 +187,139 @@ class JobListResource(Resource):
                 'message': f'Error creating job: {str(e)}'
             }, 500
 
+class JobFacetsResource(Resource):
+    """Resource for job counts by category, status, location and budget"""
+
+    def get(self):
+        """Get facet counts for jobs matching the filters"""
+        try:
+            filters = {
+                'status': request.args.get('status'),
+                'category': request.args.get('category'),
+                'user_id': request.args.get('user_id', type=int)
+            }
+            result = get_facets(
+                filters,
+                current_app.config['JOB_FACET_BUDGET_BUCKETS'],
+                current_app.config['JOB_FACET_CACHE_SECONDS']
+            )
+            return {
+                'success': True,
+                'data': result['facets'],
+                'count': result['total']
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving job facets: {str(e)}'
+            }, 500
+
+class JobStreamResource(Resource):
+    """Resource for streaming newly created jobs as Server-Sent Events"""
+
+    def get(self):
+        """Stream new jobs matching the category/location filters"""
+        if not current_app.config['JOB_STREAM_ENABLED']:
+            return {
+                'success': False,
+                'message': 'The job stream is disabled'
+            }, 404
+
+        categories = {c for c in request.args.get('category', '').split(',') if c}
+        location_text = request.args.get('location', '')
+        location = location_path(location_text)
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return {
+                'success': False,
+                'message': 'Last-Event-ID must be a job ID'
+            }, 400
+
+        start_id = job_feed.subscribe()
+        if start_id is None:
+            return {
+                'success': False,
+                'message': 'Too many open job streams, please retry later'
+            }, 503, {'Retry-After': str(current_app.config['JOB_STREAM_HEARTBEAT_SECONDS'])}
+
+        try:
+            # Replay jobs missed since the client's last event from the database
+            replay = []
+            resync_id = None
+            if last_event_id is not None and last_event_id < start_id:
+                limit = current_app.config['JOB_STREAM_REPLAY_LIMIT']
+                query = Job.query.options(selectinload(Job.user), selectinload(Job.location_node)).filter(
+                    Job.id > last_event_id, Job.id <= start_id
+                )
+                if categories:
+                    query = query.filter(Job.category.in_(categories))
+                if location:
+                    query = query.filter(location_filter(Job.location_id, location_text)).execution_options(
+                        shards=location_shards(location_text)
+                    )
+                jobs = merge_shards(query.order_by(Job.id).limit(limit).all(), Job.id, limit=limit)
+                replay = [event for event in map(make_event, jobs) if event_matches(event, categories, location)]
+                if len(jobs) == limit and jobs[-1].id < start_id:
+                    # More missed jobs than one replay holds: have the client reconnect from the last one sent
+                    resync_id = jobs[-1].id
+        except Exception as e:
+            job_feed.unsubscribe()
+            return {
+                'success': False,
+                'message': f'Error opening job stream: {str(e)}'
+            }, 500
+
+        heartbeat = current_app.config['JOB_STREAM_HEARTBEAT_SECONDS']
+
+        def stream():
+            last_id = start_id
+            yield f'retry: {heartbeat * 1000}\n\n'
+            for event in replay:
+                yield format_event(event)
+            if resync_id is not None:
+                yield format_resync(resync_id)
+                return
+            while True:
+                events = job_feed.wait(last_id, heartbeat)
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                for event in events:
+                    last_id = event.id
+                    if event_matches(event, categories, location):
+                        yield format_event(event)
+
+        response = Response(stream(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        # Runs when the client disconnects, even if the stream never started
+        response.call_on_close(job_feed.unsubscribe)
+        return response
+
 class JobResource(Resource):
     """Resource for individual job operations"""
 
     def get(self, job_id):
         """Get a specific job"""
         try:
-            job = Job.query.get_or_404(job_id)
-            schema = JobResponse.model_validate(job)
+            job = get_job(job_id)
+            archived = job is None
+            if archived:
+                job = find_archived(ArchivedJob, job_id)
+            if job is None:
+                return {
+                    'success': False,
+                    'message': 'Job not found'
+                }, 404
+
             return {
                 'success': True,
-                'data': schema.model_dump()
+                'data': render(job, JobResponse, parse_projection(request.args)),
+                'archived': archived
             }, 200
         except Exception as e:
             return {
@@ -115,17 +334,16 @@ class JobResource(Resource):
             schema = JobUpdate(**request.get_json())
 
             # Update job fields
-            update_data = schema.model_dump(exclude_unset=True)#
+            update_data = schema.dict(exclude_unset=True)
             for key, value in update_data.items():
                 if hasattr(job, key):
                     setattr(job, key, value)
 
             db.session.commit()
-            response_schema = JobResponse.model_validate(job)
             return {
                 'success': True,
                 'message': 'Job updated successfully',
-                'data': response_schema.model_dump()
+                'data': render(job, JobResponse, parse_projection(request.args))
             }, 200
 
         except ValueError as e:
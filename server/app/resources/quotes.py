@@ -1,37 +1,69 @@
-from flask import request
+from flask import request, current_app
 from flask_restful import Resource
 from sqlalchemy import desc
-from app.models import Quote, Job, User, db
+from app.models import Quote, QuoteStat, Job, User, ArchivedQuote, db
 from app.schemas import QuoteCreate, QuoteUpdate, QuoteResponse
+from app.serialization import parse_projection, render, render_list, render_many, load_options
+from app.quote_stats import stats_scope, summarize
+from app.cache import get_user, get_job
+from app.idempotency import idempotent
+from app.archive import find_archived
+from app.sharding import merge_shards
 
 class QuoteListResource(Resource):
     """Resource for listing and creating quotes"""
+    method_decorators = {'post': [idempotent]}
 
     def get(self):
-        """Get quotes by job ID"""
+        """Get quotes by job ID or by fundi"""
         try:
-            job_id = request.args.get('job_id')
-            if not job_id:
+            if 'ids' in request.args:
+                try:
+                    payload = render_many(Quote, QuoteResponse, request.args, current_app.config['MULTI_GET_MAX_IDS'])
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'message': 'Validation error',
+                        'errors': str(e)
+                    }, 400
                 return {
-                    'success': False,
-                    'message': 'job_id parameter is required'
-                }, 400
-
-            job = Job.query.get_or_404(job_id)
+                    'success': True,
+                    **payload
+                }, 200
 
-            # Only allow quotes to be viewed if job is open
-            if job.status != 'open':
+            job_id = request.args.get('job_id')
+            user_id = request.args.get('user_id')
+            if not job_id and not user_id:
                 return {
                     'success': False,
-                    'message': 'Cannot view quotes for closed jobs'
-                }, 403
+                    'message': 'job_id or user_id parameter is required'
+                }, 400
 
-            quotes = Quote.query.filter_by(job_id=job_id).order_by(desc(Quote.created_at)).all()
-            schema = QuoteResponse
+            if job_id:
+                job = get_job(job_id)
+                if job is None:
+                    return {
+                        'success': False,
+                        'message': 'Job not found'
+                    }, 404
+
+                # Only allow quotes to be viewed if job is open
+                if job.status != 'open':
+                    return {
+                        'success': False,
+                        'message': 'Cannot view quotes for closed jobs'
+                    }, 403
+
+            projection = parse_projection(request.args)
+            query = Quote.query.options(*load_options(Quote, QuoteResponse, projection))
+            if job_id:
+                query = query.filter_by(job_id=job_id)
+            if user_id:
+                query = query.filter_by(user_id=user_id)
+            quotes = merge_shards(query.order_by(desc(Quote.created_at)).all(), desc(Quote.created_at))
             return {
                 'success': True,
-                'data': [schema.model_validate(quote) for quote in quotes],
-                'count': len(quotes)
+                **render_list(quotes, QuoteResponse, projection)
             }, 200
         except Exception as e:
             return {
@@ -44,8 +76,9 @@ class QuoteListResource(Resource):
         try:
             schema = QuoteCreate(**request.get_json())
 
-            # Verify that the job exists and is open
-            job = Job.query.get(schema.job_id)
+            # Verify that the job exists and is open; its status is read past the cache, as another
+            # worker may have just closed it
+            job = get_job(schema.job_id, fresh=True)
             if not job:
                 return {
                     'success': False,
@@ -59,7 +92,7 @@ class QuoteListResource(Resource):
                 }, 403
 
             # Verify that the user exists and is a fundi
-            fundi = User.query.get(schema.user_id)
+            fundi = get_user(schema.user_id)
             if not fundi:
                 return {
                     'success': False,
@@ -89,11 +122,10 @@ class QuoteListResource(Resource):
             db.session.add(quote)
             db.session.commit()
 
-            response_schema = QuoteResponse.model_validate(quote)
             return {
                 'success': True,
                 'message': 'Quote submitted successfully',
-                'data': response_schema.model_dump()
+                'data': render(quote, QuoteResponse, parse_projection(request.args))
             }, 201
 
         except ValueError as e:
@@ -109,17 +141,57 @@ class QuoteListResource(Resource):
                 'message': f'Error creating quote: {str(e)}'
             }, 500
 
+class QuoteStatsResource(Resource):
+    """Resource for quote price statistics"""
+
+    def get(self):
+        """Get price statistics for a job, or for a category and/or location"""
+        try:
+            job_id = request.args.get('job_id', type=int)
+            category = request.args.get('category')
+            location = request.args.get('location')
+
+            if job_id is not None:
+                scope = stats_scope(job_id=job_id)
+            elif category or location:
+                scope = stats_scope(category=category, location=location)
+            else:
+                return {
+                    'success': False,
+                    'message': 'job_id, category or location parameter is required'
+                }, 400
+
+            stat = QuoteStat.query.filter_by(scope=scope).first()
+            return {
+                'success': True,
+                'data': summarize(stat)
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving quote statistics: {str(e)}'
+            }, 500
+
 class QuoteResource(Resource):
     """Resource for individual quote operations"""
 
     def get(self, quote_id):
         """Get a specific quote"""
         try:
-            quote = Quote.query.get_or_404(quote_id)
-            schema = QuoteResponse.model_validate(quote)
+            quote = db.session.get(Quote, quote_id)
+            archived = quote is None
+            if archived:
+                quote = find_archived(ArchivedQuote, quote_id)
+            if quote is None:
+                return {
+                    'success': False,
+                    'message': 'Quote not found'
+                }, 404
+
             return {
                 'success': True,
-                'data': schema.model_dump()
+                'data': render(quote, QuoteResponse, parse_projection(request.args)),
+                'archived': archived
             }, 200
         except Exception as e:
             return {
@@ -134,18 +206,17 @@ class QuoteResource(Resource):
             schema = QuoteUpdate(**request.get_json())
 
             # Only allow updates to price and message
-            update_data = schema.model_dump(exclude_unset=True)
+            update_data = schema.dict(exclude_unset=True)
             allowed_fields = ['price', 'message']
             for key, value in update_data.items():
                 if key in allowed_fields and hasattr(quote, key):
                     setattr(quote, key, value)
 
             db.session.commit()
-            response_schema = QuoteResponse.model_validate(quote)
             return {
                 'success': True,
                 'message': 'Quote updated successfully',
-                'data': response_schema.model_dump()
+                'data': render(quote, QuoteResponse, parse_projection(request.args))
             }, 200
 
         except ValueError as e:
@@ -1,15 +1,34 @@
-from flask import request
+from flask import request, current_app
 from flask_restful import Resource
 from sqlalchemy import desc
 from app.models import Review, User, Job, db
 from app.schemas import ReviewCreate, ReviewUpdate, ReviewResponse
+from app.serialization import parse_projection, render, render_list, render_many, load_options
+from app.cache import get_user, get_job
+from app.idempotency import idempotent
+from app.sharding import merge_shards
 
 class ReviewListResource(Resource):
     """Resource for listing and creating reviews"""
+    method_decorators = {'post': [idempotent]}
 
     def get(self):
         """Get reviews by user ID"""
         try:
+            if 'ids' in request.args:
+                try:
+                    payload = render_many(Review, ReviewResponse, request.args, current_app.config['MULTI_GET_MAX_IDS'])
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'message': 'Validation error',
+                        'errors': str(e)
+                    }, 400
+                return {
+                    'success': True,
+                    **payload
+                }, 200
+
             user_id = request.args.get('user_id')
             if not user_id:
                 return {
@@ -17,15 +36,23 @@ class ReviewListResource(Resource):
                     'message': 'user_id parameter is required'
                 }, 400
 
-            user = User.query.get_or_404(user_id)
+            if get_user(user_id) is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
 
             # Get reviews received by this user
-            reviews = Review.query.filter_by(reviewee_id=user_id).order_by(desc(Review.created_at)).all()
-            schema = ReviewResponse
+            projection = parse_projection(request.args)
+            reviews = (Review.query
+                       .options(*load_options(Review, ReviewResponse, projection))
+                       .filter_by(reviewee_id=user_id)
+                       .order_by(desc(Review.created_at))
+                       .all())
+            reviews = merge_shards(reviews, desc(Review.created_at))
             return {
                 'success': True,
-                'data': [schema.model_validate(review) for review in reviews],
-                'count': len(reviews)
+                **render_list(reviews, ReviewResponse, projection)
             }, 200
         except Exception as e:
             return {
@@ -39,8 +66,8 @@ class ReviewListResource(Resource):
             schema = ReviewCreate(**request.get_json())
 
             # Verify that both users exist
-            reviewer = User.query.get(schema.reviewer_id)
-            reviewee = User.query.get(schema.reviewee_id)
+            reviewer = get_user(schema.reviewer_id)
+            reviewee = get_user(schema.reviewee_id)
 
             if not reviewer:
                 return {
@@ -54,8 +81,8 @@ class ReviewListResource(Resource):
                     'message': 'Reviewee not found'
                 }, 404
 
-            # Verify that the job exists and is completed
-            job = Job.query.get(schema.job_id)
+            # Verify that the job exists and is completed, reading its status past the cache
+            job = get_job(schema.job_id, fresh=True)
             if not job:
                 return {
                     'success': False,
@@ -98,11 +125,10 @@ class ReviewListResource(Resource):
             db.session.add(review)
             db.session.commit()
 
-            response_schema = ReviewResponse.model_validate(review)
             return {
                 'success': True,
                 'message': 'Review submitted successfully',
-                'data': response_schema.model_dump()
+                'data': render(review, ReviewResponse, parse_projection(request.args))
             }, 201
 
         except ValueError as e:
@@ -125,10 +151,9 @@ class ReviewResource(Resource):
         """Get a specific review"""
         try:
             review = Review.query.get_or_404(review_id)
-            schema = ReviewResponse.model_validate(review)
             return {
                 'success': True,
-                'data': schema.model_dump()
+                'data': render(review, ReviewResponse, parse_projection(request.args))
             }, 200
         except Exception as e:
             return {
@@ -143,18 +168,17 @@ class ReviewResource(Resource):
             schema = ReviewUpdate(**request.get_json())
 
             # Only allow updates to rating and comment
-            update_data = schema.model_dump(exclude_unset=True)
+            update_data = schema.dict(exclude_unset=True)
             allowed_fields = ['rating', 'comment']
             for key, value in update_data.items():
                 if key in allowed_fields and hasattr(review, key):
                     setattr(review, key, value)
 
             db.session.commit()
-            response_schema = ReviewResponse.model_validate(review)
             return {
                 'success': True,
                 'message': 'Review updated successfully',
-                'data': response_schema.model_dump()
+                'data': render(review, ReviewResponse, parse_projection(request.args))
             }, 200
 
         except ValueError as e:
@@ -0,0 +1,37 @@
+from datetime import date
+from flask import request
+from flask_restful import Resource
+from app.rollups import rollup_rows, summarize
+from app.resources.jobs import parse_range
+
+class DailyStatsResource(Resource):
+    """Resource for the daily job, quote and review rollups"""
+
+    def get(self):
+        """Get daily counts and averages, optionally filtered by date range, category, location and status"""
+        try:
+            try:
+                rows = rollup_rows(
+                    date_from=parse_range(request.args, 'date_from', date.fromisoformat),
+                    date_to=parse_range(request.args, 'date_to', date.fromisoformat),
+                    category=request.args.get('category'),
+                    location=request.args.get('location'),
+                    status=request.args.get('status')
+                )
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': str(e)
+                }, 400
+
+            return {
+                'success': True,
+                'data': [summarize(row) for row in rows],
+                'count': len(rows)
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving daily statistics: {str(e)}'
+            }, 500
@@ -0,0 +1,96 @@
+from flask import request
+from flask_restful import Resource
+from sqlalchemy import desc, select
+from app.models import Job, User, saved_jobs, db
+from app.schemas import JobResponse
+from app.serialization import parse_projection, render, render_list, load_options
+from app.saved_jobs import save_job, unsave_job
+from app.cache import get_user
+from app.sharding import main_values, merge_shards
+
+class SavedJobListResource(Resource):
+    """Resource for listing a user's saved jobs"""
+
+    def get(self, user_id):
+        """Get the jobs a user has saved"""
+        try:
+            if get_user(user_id) is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
+
+            projection = parse_projection(request.args)
+            saved = select(saved_jobs.c.job_id).where(saved_jobs.c.user_id == user_id)
+            jobs = (Job.query
+                    .options(*load_options(Job, JobResponse, projection))
+                    .filter(Job.id.in_(main_values(saved)))
+                    .order_by(desc(Job.created_at))
+                    .all())
+            jobs = merge_shards(jobs, desc(Job.created_at))
+            for job in jobs:
+                job.is_saved = True
+
+            return {
+                'success': True,
+                **render_list(jobs, JobResponse, projection)
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving saved jobs: {str(e)}'
+            }, 500
+
+class SavedJobResource(Resource):
+    """Resource for saving and unsaving a job"""
+
+    def put(self, user_id, job_id):
+        """Save a job for a user"""
+        try:
+            if get_user(user_id) is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
+
+            # The job is rendered below, so it is read from the database rather than the cache
+            job = db.session.get(Job, job_id)
+            if job is None:
+                return {
+                    'success': False,
+                    'message': 'Job not found'
+                }, 404
+
+            created = save_job(user_id, job_id)
+            job.is_saved = True
+            return {
+                'success': True,
+                'message': 'Job saved successfully' if created else 'Job already saved',
+                'data': render(job, JobResponse, parse_projection(request.args))
+            }, 201 if created else 200
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'message': f'Error saving job: {str(e)}'
+            }, 500
+
+    def delete(self, user_id, job_id):
+        """Remove a job from a user's saved jobs"""
+        try:
+            if not unsave_job(user_id, job_id):
+                return {
+                    'success': False,
+                    'message': 'Job is not saved'
+                }, 404
+
+            return {
+                'success': True,
+                'message': 'Job unsaved successfully'
+            }, 200
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'message': f'Error unsaving job: {str(e)}'
+            }, 500
@@ -0,0 +1,36 @@
+from flask import request, current_app
+from flask_restful import Resource
+from app.sync import changes_since
+
+class SyncResource(Resource):
+    """Resource for incremental sync of users, jobs, quotes and reviews"""
+
+    def get(self):
+        """Get rows created, updated or deleted since a sync token"""
+        try:
+            since = request.args.get('since')
+            max_limit = current_app.config['SYNC_MAX_PAGE_SIZE']
+            limit = request.args.get('limit', max_limit, type=int)
+            if limit < 1:
+                return {
+                    'success': False,
+                    'message': 'limit must be a positive integer'
+                }, 400
+
+            data, next_token, has_more = changes_since(since, min(limit, max_limit))
+            return {
+                'success': True,
+                'data': data,
+                'next': next_token,
+                'has_more': has_more
+            }, 200
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }, 400
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error syncing changes: {str(e)}'
+            }, 500
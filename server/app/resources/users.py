@@ -1,20 +1,107 @@
-from flask import request
+from flask import request, current_app
 from flask_restful import Resource
+from sqlalchemy import desc, tuple_
 from app.models import User, db
 from app.schemas import UserCreate, UserUpdate, UserResponse
+from app.serialization import parse_projection, render, render_list, render_many
+from app.dashboard import build_dashboard
+from app.saved_jobs import release_saved_jobs
+from app.cache import get_user
+from app.phone import normalize_phone
+from app.locations import location_filter
+from app.sync import encode_token, decode_token
+from app.idempotency import idempotent
+
+# Directory orderings as (keyset columns, descending); the rating sorts are served by the
+# (role, ..., id) indexes on User
+USER_SORTS = {
+    'id': ((User.id,), False),
+    'rating': ((User.average_rating, User.id), True),
+    'reviews': ((User.rating_count, User.id), True),
+}
+
+def encode_cursor(sort, user):
+    columns, _ = USER_SORTS[sort]
+    return encode_token({'sort': sort, 'after': [getattr(user, column.key) for column in columns]})
+
+def decode_cursor(cursor, sort):
+    """Keyset position from a cursor issued for the same sort order"""
+    try:
+        token = decode_token(cursor)
+    except ValueError:
+        token = {}
+    position = token.get('after')
+    if token.get('sort') != sort or not isinstance(position, list) or len(position) != len(USER_SORTS[sort][0]):
+        raise ValueError('Invalid cursor')
+    return position
 
 class UserListResource(Resource):
     """Resource for listing and creating users"""
+    method_decorators = {'post': [idempotent]}
 
     def get(self):
-        """Get all users"""
+        """Get all users, or one page of the directory when limit or cursor is given"""
         try:
-            users = User.query.all()
-            schema = UserResponse
+            if 'ids' in request.args:
+                try:
+                    payload = render_many(User, UserResponse, request.args, current_app.config['MULTI_GET_MAX_IDS'])
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'message': 'Validation error',
+                        'errors': str(e)
+                    }, 400
+                return {
+                    'success': True,
+                    **payload
+                }, 200
+
+            location = request.args.get('location')
+            role = request.args.get('role')
+            sort = request.args.get('sort', 'id')
+            cursor = request.args.get('cursor')
+            paginate = cursor is not None or 'limit' in request.args
+
+            try:
+                if sort not in USER_SORTS:
+                    raise ValueError(f"sort must be one of: {', '.join(USER_SORTS)}")
+                max_limit = current_app.config['USER_DIRECTORY_MAX_PAGE_SIZE']
+                limit = request.args.get('limit', current_app.config['USER_DIRECTORY_PAGE_SIZE'], type=int)
+                if limit < 1:
+                    raise ValueError('limit must be a positive integer')
+                query = User.query
+                if location is not None:
+                    query = query.filter(location_filter(User.location_id, location))
+                if cursor is not None:
+                    columns, descending = USER_SORTS[sort]
+                    position = tuple_(*columns)
+                    after = decode_cursor(cursor, sort)
+                    query = query.filter(position < tuple(after) if descending else position > tuple(after))
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'message': 'Validation error',
+                    'errors': str(e)
+                }, 400
+
+            if role:
+                query = query.filter_by(role=role)
+            columns, descending = USER_SORTS[sort]
+            query = query.order_by(*(desc(column) if descending else column for column in columns))
+
+            projection = parse_projection(request.args)
+            if not paginate:
+                return {
+                    'success': True,
+                    **render_list(query.all(), UserResponse, projection)
+                }, 200
+
+            users = query.limit(min(limit, max_limit) + 1).all()
+            page = users[:min(limit, max_limit)]
             return {
                 'success': True,
-                'data': [schema.from_orm(user) for user in users],
-                'count': len(users)
+                **render_list(page, UserResponse, projection),
+                'next_cursor': encode_cursor(sort, page[-1]) if len(users) > len(page) else None
             }, 200
         except Exception as e:
             return {
@@ -28,7 +115,7 @@ class UserListResource(Resource):
             schema = UserCreate(**request.get_json())
 
             # Check if phone number already exists
-            existing_user = User.query.filter_by(phone=schema.phone).first()
+            existing_user = User.query.filter_by(phone_e164=schema.phone).first()
             if existing_user:
                 return {
                     'success': False,
@@ -44,11 +131,10 @@ class UserListResource(Resource):
             db.session.add(user)
             db.session.commit()
 
-            response_schema = UserResponse.from_orm(user)
             return {
                 'success': True,
                 'message': 'User created successfully',
-                'data': response_schema.dict()
+                'data': render(user, UserResponse, parse_projection(request.args))
             }, 201
 
         except ValueError as e:
@@ -70,11 +156,16 @@ class UserResource(Resource):
     def get(self, user_id):
         """Get a specific user"""
         try:
-            user = User.query.get_or_404(user_id)
-            schema = UserResponse.from_orm(user)
+            user = get_user(user_id)
+            if user is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
+
             return {
                 'success': True,
-                'data': schema.dict()
+                'data': render(user, UserResponse, parse_projection(request.args))
             }, 200
         except Exception as e:
             return {
@@ -89,8 +180,8 @@ class UserResource(Resource):
             schema = UserUpdate(**request.get_json())
 
             # Check if phone number is being updated and already exists
-            if schema.phone and schema.phone != user.phone:
-                existing_user = User.query.filter_by(phone=schema.phone).first()
+            if schema.phone and schema.phone != user.phone_e164:
+                existing_user = User.query.filter_by(phone_e164=schema.phone).first()
                 if existing_user:
                     return {
                         'success': False,
@@ -104,11 +195,10 @@ class UserResource(Resource):
                     setattr(user, key, value)
 
             db.session.commit()
-            response_schema = UserResponse.from_orm(user)
             return {
                 'success': True,
                 'message': 'User updated successfully',
-                'data': response_schema.dict()
+                'data': render(user, UserResponse, parse_projection(request.args))
             }, 200
 
         except ValueError as e:
@@ -132,6 +222,7 @@ class UserResource(Resource):
         """Delete a user"""
         try:
             user = User.query.get_or_404(user_id)
+            release_saved_jobs(user_id)
             db.session.delete(user)
             db.session.commit()
             return {
@@ -144,3 +235,64 @@ class UserResource(Resource):
                 'success': False,
                 'message': f'Error deleting user: {str(e)}'
             }, 500
+
+class UserByPhoneResource(Resource):
+    """Resource for looking up a user by phone number"""
+
+    def get(self, phone):
+        """Get the user registered with a phone number, in any common format"""
+        try:
+            user = User.query.filter_by(phone_e164=normalize_phone(phone)).first()
+            if user is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
+
+            return {
+                'success': True,
+                'data': render(user, UserResponse, parse_projection(request.args))
+            }, 200
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': 'Validation error',
+                'errors': str(e)
+            }, 400
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving user: {str(e)}'
+            }, 500
+
+class UserDashboardResource(Resource):
+    """Resource for a fundi's dashboard"""
+
+    def get(self, user_id):
+        """Get a fundi's quotes, win rate, earnings and rating summary"""
+        try:
+            user = get_user(user_id)
+            if user is None:
+                return {
+                    'success': False,
+                    'message': 'User not found'
+                }, 404
+
+            if user.role != 'fundi':
+                return {
+                    'success': False,
+                    'message': 'Dashboard is only available for fundis'
+                }, 400
+
+            return {
+                'success': True,
+                'data': {
+                    'user': render(user, UserResponse),
+                    **build_dashboard(user)
+                }
+            }, 200
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving dashboard: {str(e)}'
+            }, 500
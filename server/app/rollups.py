@@ -0,0 +1,251 @@
+from datetime import date, datetime, time
+from flask import current_app
+from sqlalchemy import insert, exists, func
+from sqlalchemy.orm import attributes
+from app.models import Job, Quote, Review, Location, ArchivedJob, ArchivedQuote, DailyRollup, db
+from app.archive import find_archived_rows
+from app.counters import add_to_rows
+from app.locations import location_path
+from app.sharding import MAIN_SHARD
+
+# Count and total columns each kind of row adds to
+MEASURES = {
+    'jobs': ('job_count', 'budget_total'),
+    'quotes': ('quote_count', 'quote_price_total'),
+    'reviews': ('review_count', 'rating_total'),
+}
+
+# Kind and summed column of the rows counted under their job's bucket
+CHILDREN = {Quote: ('quotes', 'price'), Review: ('reviews', 'rating')}
+
+MEASURE_COLUMNS = [column for measures in MEASURES.values() for column in measures]
+
+
+def _previous(obj, key):
+    """Value of ``key`` as last loaded from the database"""
+    history = attributes.get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    return (history.unchanged or history.added or [None])[0]
+
+
+def _location_path(session, location_id):
+    # Locations are usually in the identity map already, as the job's location_node
+    return session.get(Location, location_id).path if location_id is not None else ''
+
+
+def _bucket(session, created_at, job, previous=False):
+    """Rollup key of a row created at ``created_at`` under ``job``: (day, category, location, status)"""
+    value = (lambda key: _previous(job, key)) if previous else (lambda key: getattr(job, key))
+    location_id = value('location_id')
+    if location_id is None and not previous and job.location_node is not None:
+        location = job.location_node.path  # New job whose location is linked on this flush
+    else:
+        location = _location_path(session, location_id)
+    day = (created_at or datetime.utcnow()).date()
+    return day, value('category'), location, value('status') or 'open'
+
+
+def collect_rollup_changes(session, flush_context, instances):
+    """Note the job, quote and review inserts, edits and deletes to fold into the daily rollups"""
+    if not current_app.config['ROLLUPS_INCREMENTAL']:
+        return
+    changes = []  # (bucket, kind, value, weight)
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Job):
+                changes.append((_bucket(session, obj.created_at, obj), 'jobs', obj.budget, 1))
+            elif type(obj) in CHILDREN:
+                kind, column = CHILDREN[type(obj)]
+                job = obj.job or session.get(Job, obj.job_id)
+                if job is not None:
+                    changes.append((_bucket(session, obj.created_at, job), kind, getattr(obj, column), 1))
+
+        for obj in session.deleted:
+            if isinstance(obj, Job):
+                changes.append((_bucket(session, obj.created_at, obj, previous=True), 'jobs', _previous(obj, 'budget'), -1))
+            elif type(obj) in CHILDREN:
+                kind, column = CHILDREN[type(obj)]
+                job = session.get(Job, _previous(obj, 'job_id'))
+                if job is not None:
+                    bucket = _bucket(session, obj.created_at, job, previous=True)
+                    changes.append((bucket, kind, _previous(obj, column), -1))
+
+        for obj in session.dirty:
+            if isinstance(obj, Job) and any(attributes.get_history(obj, key).has_changes()
+                                            for key in ('category', 'location_id', 'status', 'budget')):
+                old = _bucket(session, obj.created_at, obj, previous=True)
+                new = _bucket(session, obj.created_at, obj)
+                changes.append((old, 'jobs', _previous(obj, 'budget'), -1))
+                changes.append((new, 'jobs', obj.budget, 1))
+                if old[1:] != new[1:]:
+                    # Move the job's quotes and reviews to the new category, location or status
+                    for child in (*obj.quotes, *obj.reviews):
+                        if child not in session.new and child not in session.deleted:
+                            kind, column = CHILDREN[type(child)]
+                            changes.append((_bucket(session, child.created_at, obj, previous=True), kind,
+                                            _previous(child, column), -1))
+                            changes.append((_bucket(session, child.created_at, obj), kind, _previous(child, column), 1))
+            elif type(obj) in CHILDREN:
+                kind, column = CHILDREN[type(obj)]
+                if attributes.get_history(obj, column).has_changes():
+                    job = obj.job or session.get(Job, obj.job_id)
+                    if job is not None:
+                        bucket = _bucket(session, obj.created_at, job)
+                        changes.append((bucket, kind, _previous(obj, column), -1))
+                        changes.append((bucket, kind, getattr(obj, column), 1))
+
+    if changes:
+        session.info.setdefault('rollup_changes', []).extend(changes)
+
+
+def update_rollups(session, flush_context):
+    """Apply the collected changes once the rows behind them are written"""
+    changes = session.info.pop('rollup_changes', None)
+    if changes:
+        apply_changes(session, changes)
+
+
+def _forget_rollup_changes(session):
+    session.info.pop('rollup_changes', None)
+
+
+def _stamp(table, excluded):
+    return {'updated_at': excluded.updated_at}
+
+
+def apply_changes(session, changes):
+    """Add ``changes`` onto the rollup rows they touch as upserted increments, without reading or locking them"""
+    now = datetime.utcnow()
+    deltas = {}
+    for bucket, kind, value, weight in changes:
+        count, total = MEASURES[kind]
+        day, category, location, status = bucket
+        row = deltas.setdefault(bucket, {'day': day, 'category': category, 'location': location, 'status': status,
+                                         **dict.fromkeys(MEASURE_COLUMNS, 0), 'updated_at': now})
+        row[count] += weight
+        row[total] += (value or 0) * weight
+
+    rows = [row for row in deltas.values() if any(row[column] for column in MEASURE_COLUMNS)]
+    add_to_rows(session.connection(bind_arguments={'shard': MAIN_SHARD}), DailyRollup.__table__,
+                ['day', 'category', 'location', 'status'], rows, assign=_stamp)
+
+
+def _day(value):
+    # func.date() gives a date on PostgreSQL and an ISO string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _grouped(created_at, job, value, *joins, start=None):
+    """Count and total of ``value`` per creation day and job category, location id and status"""
+    day = func.date(created_at)
+    query = db.session.query(job.category, job.location_id, job.status, day, func.count(), func.sum(value))
+    for target, onclause in joins:
+        query = query.join(target, onclause)
+    if start is not None:
+        query = query.filter(created_at >= start)
+    return query.group_by(job.category, job.location_id, job.status, day)
+
+
+def rebuild_rollups(since=None):
+    """Recompute the rollups of every day from ``since`` (or of all days) from the jobs, quotes and reviews tables.
+
+    Catches the rollups up after bulk loads, or on a schedule when
+    ROLLUPS_INCREMENTAL is off. Archived jobs and quotes are counted too, so
+    archiving does not rewrite history. Returns the number of rollup rows.
+    """
+    start = datetime.combine(since, time.min) if since is not None else None
+    sources = [
+        ('jobs', _grouped(Job.created_at, Job, Job.budget, start=start).all()),
+        ('quotes', _grouped(Quote.created_at, Job, Quote.price, (Job, Quote.job_id == Job.id), start=start).all()),
+        ('reviews', _grouped(Review.created_at, Job, Review.rating, (Job, Review.job_id == Job.id), start=start).all()),
+        ('jobs', find_archived_rows(_grouped(ArchivedJob.created_at, ArchivedJob, ArchivedJob.budget, start=start))),
+        ('quotes', find_archived_rows(_grouped(ArchivedQuote.created_at, ArchivedJob, ArchivedQuote.price,
+                                               (ArchivedJob, ArchivedQuote.job_id == ArchivedJob.id), start=start))),
+        ('reviews', _archived_job_reviews(start)),
+    ]
+    location_ids = {row[1] for _, rows in sources for row in rows if row[1] is not None}
+    paths = dict(db.session.query(Location.id, Location.path).filter(Location.id.in_(location_ids)))
+
+    totals = {}
+    for kind, rows in sources:
+        count_column, total_column = MEASURES[kind]
+        for category, location_id, status, day, count, total in rows:
+            bucket = (_day(day), category, paths.get(location_id, ''), status or 'open')
+            row = totals.setdefault(bucket, dict.fromkeys(MEASURE_COLUMNS, 0))
+            row[count_column] += count
+            row[total_column] += total or 0
+
+    query = db.session.query(DailyRollup)
+    if since is not None:
+        query = query.filter(DailyRollup.day >= since)
+    query.delete(synchronize_session=False)
+    now = datetime.utcnow()
+    rows = [{'day': day, 'category': category, 'location': location, 'status': status, **measures, 'updated_at': now}
+            for (day, category, location, status), measures in totals.items()]
+    if rows:
+        db.session.execute(insert(DailyRollup.__table__), rows, bind_arguments={'mapper': DailyRollup.__mapper__})
+    db.session.commit()
+    return len(rows)
+
+
+def _archived_job_reviews(start):
+    """Rollup rows of reviews whose job has been archived (the archive may be a database of its own)"""
+    day = func.date(Review.created_at)
+    query = (db.session.query(Review.job_id, day, func.count(), func.sum(Review.rating))
+             .filter(~exists().where(Job.id == Review.job_id)))
+    if start is not None:
+        query = query.filter(Review.created_at >= start)
+    rows = query.group_by(Review.job_id, day).all()
+    if not rows:
+        return []
+    jobs = {job.id: job for job in find_archived_rows(
+        db.session.query(ArchivedJob).filter(ArchivedJob.id.in_({row[0] for row in rows}))
+    )}
+    return [(jobs[job_id].category, jobs[job_id].location_id, jobs[job_id].status, day, count, total)
+            for job_id, day, count, total in rows if job_id in jobs]
+
+
+def rollup_rows(date_from=None, date_to=None, category=None, location=None, status=None):
+    """Rollup rows in day order, optionally narrowed to a date range, category, location subtree or status"""
+    query = DailyRollup.query
+    if date_from is not None:
+        query = query.filter(DailyRollup.day >= date_from)
+    if date_to is not None:
+        query = query.filter(DailyRollup.day <= date_to)
+    if category:
+        query = query.filter(DailyRollup.category == category)
+    if status:
+        query = query.filter(DailyRollup.status == status)
+    if location is not None:
+        path = location_path(location)
+        if not path:
+            raise ValueError('location must not be empty')
+        query = query.filter((DailyRollup.location == path) |
+                             ((DailyRollup.location > f'{path}/') & (DailyRollup.location < f'{path}0')))
+    return query.order_by(DailyRollup.day, DailyRollup.category, DailyRollup.location, DailyRollup.status).all()
+
+
+def summarize(row):
+    """Rollup row served by the daily stats endpoint, with averages"""
+    return {
+        'day': row.day.isoformat(),
+        'category': row.category,
+        'location': row.location,
+        'status': row.status,
+        'jobs': row.job_count,
+        'average_budget': row.budget_total / row.job_count if row.job_count > 0 else None,
+        'quotes': row.quote_count,
+        'average_quote_price': row.quote_price_total / row.quote_count if row.quote_count > 0 else None,
+        'reviews': row.review_count,
+        'average_rating': row.rating_total / row.review_count if row.review_count > 0 else None
+    }
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', collect_rollup_changes),
+    ('after_flush', update_rollups),
+    ('after_rollback', _forget_rollup_changes),
+)
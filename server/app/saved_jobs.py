@@ -0,0 +1,60 @@
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from app.models import Job, saved_jobs, db
+from app.cache import invalidate
+
+
+def saved_job_ids(user_id, job_ids):
+    """Which of ``job_ids`` the user has saved, with one IN query on the saved_jobs key"""
+    if not job_ids:
+        return set()
+    rows = db.session.execute(
+        select(saved_jobs.c.job_id)
+        .where(saved_jobs.c.user_id == user_id, saved_jobs.c.job_id.in_(job_ids))
+    )
+    return {job_id for job_id, in rows}
+
+
+def mark_saved(jobs, user_id):
+    """Set ``is_saved`` on a page of jobs for the viewing user"""
+    saved = saved_job_ids(user_id, [job.id for job in jobs])
+    for job in jobs:
+        job.is_saved = job.id in saved
+
+
+def save_job(user_id, job_id):
+    """Save a job for a user; returns False if it was already saved"""
+    try:
+        db.session.execute(insert(saved_jobs).values(user_id=user_id, job_id=job_id))
+        _adjust_saved_count([job_id], 1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def unsave_job(user_id, job_id):
+    """Remove a saved job; returns False if it was not saved"""
+    result = db.session.execute(
+        delete(saved_jobs).where(saved_jobs.c.user_id == user_id, saved_jobs.c.job_id == job_id)
+    )
+    if result.rowcount:
+        _adjust_saved_count([job_id], -1)
+    db.session.commit()
+    return bool(result.rowcount)
+
+
+def release_saved_jobs(user_id):
+    """Decrement the saved count of every job a user saved, before the user is deleted"""
+    job_ids = list(db.session.scalars(select(saved_jobs.c.job_id).where(saved_jobs.c.user_id == user_id)))
+    _adjust_saved_count(job_ids, -1)
+
+
+def _adjust_saved_count(job_ids, delta):
+    if job_ids:
+        Job.query.filter(Job.id.in_(job_ids)).update(
+            {Job.saved_count: Job.saved_count + delta}, synchronize_session='fetch'
+        )
+        # Bulk updates bypass the flush hooks that keep cached rows fresh
+        invalidate(Job, job_ids)
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field, validator
 from enum import Enum
+from app.phone import normalize_phone
 
 class UserRole(str, Enum):
     HOMEOWNER = "homeowner"
@@ -31,7 +32,10 @@ class UserBase(BaseModel):
     location: str = Field(..., min_length=1, max_length=100)
 
 class UserCreate(UserBase):
-    pass
+
+    @validator('phone')
+    def _normalize_phone(cls, phone):
+        return normalize_phone(phone)
 
 class UserUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
@@ -39,6 +43,10 @@ class UserUpdate(BaseModel):
     role: Optional[UserRole] = None
     location: Optional[str] = Field(None, min_length=1, max_length=100)
 
+    @validator('phone')
+    def _normalize_phone(cls, phone):
+        return normalize_phone(phone) if phone is not None else None
+
 class JobBase(BaseModel):
     user_id: int
     title: str = Field(..., min_length=1, max_length=200)
@@ -89,9 +97,12 @@ class ReviewUpdate(BaseModel):
 class UserResponse(UserBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    location_id: Optional[int] = None
     jobs_count: Optional[int] = 0
     quotes_count: Optional[int] = 0
     average_rating: Optional[float] = 0.0
+    rating_count: Optional[int] = 0
 
     class Config:
         orm_mode = True
@@ -103,8 +114,12 @@ class JobResponse(JobBase):
     id: int
     status: JobStatus
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    location_id: Optional[int] = None
     user: Optional[UserResponse] = None
     quotes_count: Optional[int] = 0
+    saved_count: Optional[int] = 0
+    is_saved: Optional[bool] = None
 
     class Config:
         orm_mode = True
@@ -115,6 +130,7 @@ class JobResponse(JobBase):
 class QuoteResponse(QuoteBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
     job: Optional[JobResponse] = None
     fundi: Optional[UserResponse] = None
 
@@ -127,6 +143,7 @@ class QuoteResponse(QuoteBase):
 class ReviewResponse(ReviewBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
     reviewer: Optional[UserResponse] = None
     reviewee: Optional[UserResponse] = None
     job: Optional[JobResponse] = None
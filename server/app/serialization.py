@@ -0,0 +1,194 @@
+from sqlalchemy.orm import selectinload
+from app.models import User, Job
+from app.schemas import UserResponse, JobResponse, QuoteResponse, ReviewResponse
+
+# Nested objects each response schema can render, keyed by the relationship they are read from
+EXPANDABLE = {
+    UserResponse: {},
+    JobResponse: {'user': UserResponse},
+    QuoteResponse: {'job': JobResponse, 'fundi': UserResponse},
+    ReviewResponse: {'reviewer': UserResponse, 'reviewee': UserResponse, 'job': JobResponse},
+}
+
+# Types sideloaded into compound documents; jobs come first because they reference users
+SIDELOADED = [(Job, JobResponse), (User, UserResponse)]
+
+
+class Projection:
+    """Which fields and nested objects of a response to render.
+
+    ``fields`` limits the top-level fields (``None`` renders all of them) and
+    ``expand`` lists the nested objects to render, with dotted paths such as
+    ``job.user`` reaching into nested objects (``None`` renders every nested
+    object, which is the default response shape). A ``compound`` projection
+    renders nested objects once each under ``included`` instead of inline.
+    """
+
+    def __init__(self, fields=None, expand=None, compound=False):
+        self.fields = fields
+        self.expand = expand
+        self.compound = compound
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        if self.expand is None:
+            return self.includes(name)
+        return (name in self.expand
+                or any(path.startswith(name + '.') for path in self.expand)
+                or (self.fields is not None and name in self.fields))
+
+    def nested(self, name):
+        """Projection for the nested object rendered under ``name``"""
+        if self.expand is None:
+            return Projection()
+        prefix = name + '.'
+        return Projection(expand={path[len(prefix):] for path in self.expand if path.startswith(prefix)})
+
+
+def _split(value):
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def parse_projection(args):
+    """Build a projection from the ``fields``, ``expand`` and ``format`` query parameters"""
+    fields = args.get('fields')
+    expand = args.get('expand')
+    return Projection(
+        fields=_split(fields) if fields is not None else None,
+        expand=_split(expand) if expand is not None else None,
+        compound=args.get('format') == 'compound'
+    )
+
+
+def render(obj, schema, projection=None):
+    """Serialize an ORM object to a dict shaped like ``schema``.
+
+    Only the nested objects selected by the projection are read, so
+    relationships that are not expanded are never loaded.
+    """
+    projection = projection or Projection()
+    nested = EXPANDABLE[schema]
+    data = {}
+    for name, field in schema.__fields__.items():
+        if name in nested:
+            if projection.expands(name):
+                child = getattr(obj, name)
+                data[name] = render(child, nested[name], projection.nested(name)) if child is not None else None
+        elif projection.includes(name):
+            data[name] = getattr(obj, name, field.default)
+    return data
+
+
+def load_options(model, schema, projection=None):
+    """Eager-load options fetching the expanded relationships with one query each"""
+    projection = projection or Projection()
+    options = []
+    if projection.compound:
+        return options
+    for name, nested_schema in EXPANDABLE[schema].items():
+        if projection.expands(name):
+            relationship = getattr(model, name)
+            target = relationship.property.mapper.class_
+            options.append(selectinload(relationship).options(
+                *load_options(target, nested_schema, projection.nested(name))
+            ))
+    return options
+
+
+def _foreign_key(model, name):
+    """Column holding the id of the object behind relationship ``name``"""
+    column, = getattr(model, name).property.local_columns
+    return column.key
+
+
+def _collect_ids(objs, schema, projection, wanted):
+    """Add the ids of expanded nested objects to ``wanted`` ({model: (ids, projections)})"""
+    if not objs:
+        return
+    model = type(objs[0])
+    for name in EXPANDABLE[schema]:
+        if projection.expands(name):
+            target = getattr(model, name).property.mapper.class_
+            key = _foreign_key(model, name)
+            ids, projections = wanted.setdefault(target, (set(), []))
+            ids.update(getattr(obj, key) for obj in objs if getattr(obj, key) is not None)
+            projections.append(projection.nested(name))
+
+
+def render_list(objs, schema, projection=None):
+    """Payload for a list response.
+
+    Compound documents render each row with foreign-key ids only and
+    sideload the referenced users and jobs once each under ``included``,
+    fetched with a single ``IN`` query per type.
+    """
+    projection = projection or Projection()
+    if not projection.compound:
+        return {
+            'data': [render(obj, schema, projection) for obj in objs],
+            'count': len(objs)
+        }
+
+    flat = Projection(fields=projection.fields, expand=set())
+    wanted = {}
+    _collect_ids(objs, schema, projection, wanted)
+
+    included = {}
+    for model, model_schema in SIDELOADED:
+        if model not in wanted:
+            continue
+        ids, projections = wanted.pop(model)
+        rows = model.query.filter(model.id.in_(ids)).all() if ids else []
+        for nested_projection in projections:
+            _collect_ids(rows, model_schema, nested_projection, wanted)
+        included[model.__tablename__] = {
+            row.id: render(row, model_schema, Projection(expand=set())) for row in rows
+        }
+
+    return {
+        'data': [render(obj, schema, flat) for obj in objs],
+        'included': included,
+        'count': len(objs)
+    }
+
+
+def parse_ids(args, max_ids):
+    """Ids from ``?ids=3,1,2`` in request order, without duplicates"""
+    ids = []
+    for item in args.get('ids', '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            row_id = int(item)
+        except ValueError:
+            raise ValueError(f'Invalid id in ids: {item}')
+        if row_id not in ids:
+            ids.append(row_id)
+    if not ids:
+        raise ValueError('ids must list at least one id')
+    if len(ids) > max_ids:
+        raise ValueError(f'ids accepts at most {max_ids} ids per request')
+    return ids
+
+
+def render_many(model, schema, args, max_ids, prepare=None):
+    """Payload for a multi-get: the rows named by ``?ids=`` from one ``IN`` query.
+
+    Rows come back in the order requested, with the same eager loading as the
+    detail view; ids with no row are listed under ``missing``. ``prepare`` is
+    called with the rows before rendering. Raises ValueError for bad ids.
+    """
+    ids = parse_ids(args, max_ids)
+    projection = parse_projection(args)
+    rows = model.query.options(*load_options(model, schema, projection)).filter(model.id.in_(ids)).all()
+    by_id = {row.id: row for row in rows}
+    rows = [by_id[row_id] for row_id in ids if row_id in by_id]
+    if prepare is not None:
+        prepare(rows)
+    return {
+        **render_list(rows, schema, projection),
+        'missing': [row_id for row_id in ids if row_id not in by_id]
+    }
@@ -0,0 +1,231 @@
+from flask import current_app
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, inspect, select, insert, update, func
+from sqlalchemy.orm import Mapper
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.sql import operators
+
+# Tables split across the county shards; everything else lives in the main database only
+SHARDED_TABLES = ('jobs', 'quotes', 'reviews')
+
+# Shard of counties without a database of their own, which is also where rows written before sharding stay
+MAIN_SHARD = 'main'
+
+
+def sharding_enabled():
+    return bool(current_app.config['SHARD_DATABASE_URLS'])
+
+
+def shard_ids():
+    """Every shard, the main database first"""
+    return [MAIN_SHARD, *current_app.config['SHARD_DATABASE_URLS']]
+
+
+def bind_key(shard):
+    """Flask-SQLAlchemy bind key of a shard's engine"""
+    return None if shard == MAIN_SHARD else f'shard_{shard}'
+
+
+def shard_for_county(county):
+    return county if county in current_app.config['SHARD_DATABASE_URLS'] else MAIN_SHARD
+
+
+def shard_of(obj):
+    """Shard an ORM object was loaded from or assigned to, or None"""
+    return inspect(obj).info.get('shard')
+
+
+def _is_sharded(mapper):
+    return mapper is not None and mapper.local_table.name in SHARDED_TABLES
+
+
+class RoutingSession(FlaskSession):
+    """``db.session`` class that keeps jobs, quotes and reviews in their county's shard.
+
+    Statements go to the shard named by the ``shard`` bind argument. Without
+    one, ORM statements on sharded tables are fanned out by
+    :func:`route_to_shards`, and flushed rows are written to the shard
+    recorded on their instance. With no shards configured it behaves like
+    the stock Flask-SQLAlchemy session.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        # Per-instance connections rule out ORM bulk inserts, so only route flushes when sharding is on
+        if sharding_enabled():
+            self.connection_callable = self._flush_connection
+
+    def commit(self):
+        # While an idempotent request runs, its commits only flush; the wrapper commits the
+        # writes together with the stored response (see app.idempotency)
+        if self.info.get('hold_commit'):
+            self.flush()
+            return
+        super().commit()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, **kwargs):
+        if shard is not None:
+            return self._db.engines[bind_key(shard)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _flush_connection(self, mapper=None, instance=None, **kwargs):
+        """Connection the unit of work writes ``instance`` with"""
+        shard = shard_of(instance) if instance is not None and _is_sharded(mapper) else None
+        return self.get_transaction().connection(mapper, **({'shard': shard} if shard else {}))
+
+
+def _target_shards(orm_execute_state):
+    """Shards an ORM statement on a sharded table has to run against"""
+    if orm_execute_state.is_select:
+        # Refreshing or lazy loading from a row only needs that row's shard
+        parent = orm_execute_state.load_options._refresh_state or orm_execute_state.lazy_loaded_from
+        if parent is not None and parent.info.get('shard'):
+            return [parent.info['shard']]
+    return orm_execute_state.execution_options.get('shards') or shard_ids()
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def route_to_shards(orm_execute_state):
+    """Run ORM statements on sharded tables on every shard that may hold their rows and merge the results.
+
+    Merged rows come shard by shard; callers needing one overall order sort
+    them with :func:`merge_shards`. Pass ``execution_options(shards=[...])``
+    to narrow the fan-out when a filter pins the rows to some shards.
+    """
+    if (not _is_sharded(orm_execute_state.bind_mapper) or 'shard' in orm_execute_state.bind_arguments
+            or not sharding_enabled()):
+        return None
+    results = [orm_execute_state.invoke_statement(bind_arguments={'shard': shard})
+               for shard in _target_shards(orm_execute_state)]
+    return results[0].merge(*results[1:])
+
+
+@event.listens_for(Mapper, 'load')
+def _record_shard(target, context):
+    """Remember which shard a row came from, so it is refreshed, lazy loaded from and written back there"""
+    shard = context.bind_arguments.get('shard')
+    if shard is not None:
+        inspect(target).info['shard'] = shard
+
+
+def _sort_key(value):
+    # Nulls sort first, as they do in SQLite
+    return value is not None, value
+
+
+def merge_shards(rows, *order_by, limit=None, entity=None):
+    """Put rows fanned out from several shards into ``order_by`` order and keep the first ``limit``.
+
+    ``order_by`` takes the clauses given to the query, e.g. ``desc(Job.created_at)``,
+    and ``entity`` picks the ORM object out of each row for tuple results. Each
+    shard returns an already-sorted run, so the sort only merges the runs.
+    Rows are returned unchanged when sharding is off.
+    """
+    if not sharding_enabled():
+        return rows
+    for clause in reversed(order_by):
+        descending = getattr(clause, 'modifier', None) is operators.desc_op
+        key = (clause.element if descending else clause).key
+        rows.sort(key=lambda row: _sort_key(getattr(entity(row) if entity else row, key)), reverse=descending)
+    return rows[:limit] if limit is not None else rows
+
+
+def main_values(stmt):
+    """A subquery on main-database tables, usable in a filter on a sharded table.
+
+    The shards do not have the main tables, so with sharding on the subquery
+    runs up front and its values are inlined.
+    """
+    if not sharding_enabled():
+        return stmt
+    from app.models import db
+    return list(db.session.scalars(stmt))
+
+
+def _job_county(session, job):
+    """County of a new job: of its location, or else of its owner's"""
+    from app.models import User, Location
+    from app.locations import location_path
+    if job.location_node is not None:
+        path = job.location_node.path
+    elif job.location_id is not None:
+        path = session.get(Location, job.location_id).path
+    else:
+        owner = job.user or session.get(User, job.user_id)
+        path = location_path(owner.location) if owner is not None else ''
+    return path.split('/')[0]
+
+
+def allocate_ids(session, model, count):
+    """First of ``count`` consecutive ids for ``model``'s table, unique across every shard.
+
+    The counters live in the main database's shard_sequences table; the first
+    allocation for a table starts above the highest id in any shard.
+    """
+    from app.models import ShardSequence
+    sequences = ShardSequence.__table__
+    table_name = model.__tablename__
+    main = session.connection(bind_arguments={'shard': MAIN_SHARD})
+    bumped = main.execute(update(sequences)
+                          .where(sequences.c.table_name == table_name)
+                          .values(next_id=sequences.c.next_id + count))
+    if bumped.rowcount:
+        return main.scalar(select(sequences.c.next_id).where(sequences.c.table_name == table_name)) - count
+    start = max((value or 0 for value in session.scalars(select(func.max(model.id)))), default=0) + 1
+    main.execute(insert(sequences).values(table_name=table_name, next_id=start + count))
+    return start
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def assign_shards(session, flush_context, instances):
+    """Place new jobs in their county's shard and their quotes and reviews next to them, with fresh ids"""
+    if not sharding_enabled():
+        return
+    from app.models import Job
+    new = {table_name: [] for table_name in SHARDED_TABLES}
+    for obj in session.new:
+        if getattr(obj, '__tablename__', None) in new:
+            new[obj.__tablename__].append(obj)
+
+    with session.no_autoflush:
+        for job in new['jobs']:
+            inspect(job).info['shard'] = shard_for_county(_job_county(session, job))
+        for obj in (*new['quotes'], *new['reviews']):
+            job = obj.job or session.get(Job, obj.job_id)
+            inspect(obj).info['shard'] = (shard_of(job) if job is not None else None) or MAIN_SHARD
+
+        for objs in new.values():
+            unnumbered = [obj for obj in objs if obj.id is None]
+            if unnumbered:
+                first = allocate_ids(session, type(unnumbered[0]), len(unnumbered))
+                for offset, obj in enumerate(unnumbered):
+                    obj.id = first + offset
+
+
+def create_shard_tables():
+    """Create the sharded tables in every shard database that lacks them.
+
+    Shards hold only jobs, quotes and reviews, so foreign keys to main-database
+    tables (users, locations) are left out there.
+    """
+    from app.models import db, Job, Quote, Review
+    tables = [Job.__table__, Quote.__table__, Review.__table__]
+    for shard in shard_ids()[1:]:
+        with db.engines[bind_key(shard)].begin() as connection:
+            existing = set(inspect(connection).get_table_names())
+            for table in tables:
+                if table.name in existing:
+                    continue
+                for column in table.columns:
+                    if hasattr(column.type, 'create'):
+                        column.type.create(connection, checkfirst=True)
+                connection.execute(CreateTable(table, include_foreign_key_constraints=[
+                    constraint for constraint in table.foreign_key_constraints
+                    if constraint.referred_table.name in SHARDED_TABLES
+                ]))
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index))
+    # Seed the id counters now rather than racing for them on the first writes
+    for model in (Job, Quote, Review):
+        allocate_ids(db.session, model, 0)
+    db.session.commit()
@@ -0,0 +1,84 @@
+import json
+import math
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch-style).
+
+    Positive values fall into logarithmic buckets ``(gamma^(i-1), gamma^i]``,
+    so any quantile is answered within ``relative_accuracy`` of the true
+    value. Counts are plain integers, which makes the sketch mergeable and
+    lets values be removed again when a quote is edited or deleted.
+    """
+
+    def __init__(self, relative_accuracy=0.01, buckets=None, zero_count=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = buckets or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def bucket(self, value):
+        """Index of the bucket ``value`` is counted in, or None for the zero bucket"""
+        return self._index(value) if value > 0 else None
+
+    def _value(self, index):
+        """Representative value of a bucket, within the relative accuracy of every value in it"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        """Add ``value`` (or remove it with a negative weight)"""
+        if value <= 0:
+            self.zero_count = max(0, self.zero_count + weight)
+            return
+        index = self._index(value)
+        count = self.buckets.get(index, 0) + weight
+        if count > 0:
+            self.buckets[index] = count
+        else:
+            self.buckets.pop(index, None)
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+
+    def quantile(self, q):
+        """Approximate value at quantile ``q`` (0 <= q <= 1), or None when empty"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def to_json(self):
+        return json.dumps({
+            'accuracy': self.relative_accuracy,
+            'zero': self.zero_count,
+            'buckets': {str(index): count for index, count in self.buckets.items()}
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, raw):
+        if not raw:
+            return cls()
+        data = json.loads(raw)
+        return cls(
+            relative_accuracy=data['accuracy'],
+            buckets={int(index): count for index, count in data['buckets'].items()},
+            zero_count=data['zero']
+        )
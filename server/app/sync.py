@@ -0,0 +1,154 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_
+from app.models import User, Job, Quote, Review, Tombstone
+from app.sharding import merge_shards
+
+# Synced tables, keyed by the short name used in sync tokens
+SYNCED_MODELS = {
+    'u': User,
+    'j': Job,
+    'q': Quote,
+    'r': Review,
+}
+
+TOMBSTONED_TABLES = tuple(model.__tablename__ for model in SYNCED_MODELS.values())
+
+# Columns sent for each synced table; derived and server-side columns (phone_e164, location_id, saved_count) stay out
+SYNCED_COLUMNS = {
+    'u': ('id', 'name', 'phone', 'role', 'location', 'rating_count', 'average_rating', 'created_at', 'updated_at'),
+    'j': ('id', 'user_id', 'title', 'description', 'category', 'preferred_date', 'budget', 'status',
+          'created_at', 'updated_at'),
+    'q': ('id', 'job_id', 'user_id', 'price', 'message', 'created_at', 'updated_at'),
+    'r': ('id', 'reviewer_id', 'reviewee_id', 'rating', 'comment', 'job_id', 'created_at', 'updated_at'),
+}
+
+
+def record_tombstones(session, flush_context, instances):
+    """Write a tombstone for every synced row deleted in this flush (including cascades)"""
+    for obj in list(session.deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name in TOMBSTONED_TABLES and obj.id is not None:
+            session.add(Tombstone(table_name=table_name, row_id=obj.id))
+
+
+def encode_token(cursors):
+    """Encode per-table cursors into an opaque, URL-safe sync token"""
+    raw = json.dumps(cursors, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Decode a sync token; raises ValueError if it is malformed"""
+    if not token:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursors = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid sync token')
+    if not isinstance(cursors, dict):
+        raise ValueError('Invalid sync token')
+    return cursors
+
+
+def compact_row(obj, columns):
+    """Values of ``columns``, leaving out the ones that are NULL"""
+    row = {}
+    for column in columns:
+        value = getattr(obj, column)
+        if value is not None:
+            row[column] = value
+    return row
+
+
+def next_cursor(rows, more, window, column='updated_at'):
+    """Cursor after ``rows`` ([``column``, id]), held ``window`` behind now once the client has caught up.
+
+    A row's updated_at (a tombstone's deleted_at) is set before its transaction commits, so a slow
+    transaction can commit a row behind a cursor that has already moved
+    past it. Holding the last cursor of a catch-up back by the safety
+    window makes the next sync re-read that window: rows may be sent twice,
+    which clients apply as upserts, but none are missed. While there are
+    more pages the cursor follows the rows, so paging always moves forward.
+    """
+    cursor = [getattr(rows[-1], column), rows[-1].id]
+    if not more:
+        horizon = datetime.utcnow() - window
+        if cursor[0] > horizon:
+            cursor = [horizon, 0]
+    return [cursor[0].isoformat(), cursor[1]]
+
+
+def changed_rows(model, cursor, limit):
+    """Rows of ``model`` created or updated after ``cursor`` ([updated_at, id]), oldest first"""
+    query = model.query
+    if cursor:
+        updated_at, row_id = datetime.fromisoformat(cursor[0]), cursor[1]
+        query = query.filter(or_(
+            model.updated_at > updated_at,
+            and_(model.updated_at == updated_at, model.id > row_id)
+        ))
+    rows = merge_shards(query.order_by(model.updated_at, model.id).limit(limit + 1).all(),
+                        model.updated_at, model.id, limit=limit + 1)
+    return rows[:limit], len(rows) > limit
+
+
+def deleted_rows(cursor, limit):
+    """Tombstones recorded after ``cursor`` ([deleted_at, id]), oldest first.
+
+    Tombstone ids are handed out before their transactions commit too, so
+    they are paged like changed rows rather than by id alone. A bare id is
+    a cursor from a token issued before that, and is still honoured.
+    """
+    query = Tombstone.query
+    if isinstance(cursor, int):
+        query = query.filter(Tombstone.id > cursor)
+    elif cursor:
+        deleted_at, row_id = datetime.fromisoformat(cursor[0]), cursor[1]
+        query = query.filter(or_(
+            Tombstone.deleted_at > deleted_at,
+            and_(Tombstone.deleted_at == deleted_at, Tombstone.id > row_id)
+        ))
+    tombstones = query.order_by(Tombstone.deleted_at, Tombstone.id).limit(limit + 1).all()
+    return tombstones[:limit], len(tombstones) > limit
+
+
+def changes_since(token, limit):
+    """Collect one page of changes after ``token`` and the token for the next page"""
+    cursors = decode_token(token)
+    data = {}
+    has_more = False
+    window = timedelta(seconds=current_app.config['SYNC_SAFETY_WINDOW_SECONDS'])
+
+    for key, model in SYNCED_MODELS.items():
+        try:
+            rows, more = changed_rows(model, cursors.get(key), limit)
+        except (TypeError, ValueError, IndexError):
+            raise ValueError('Invalid sync token')
+        data[model.__tablename__] = [compact_row(row, SYNCED_COLUMNS[key]) for row in rows]
+        has_more = has_more or more
+        if rows:
+            cursors[key] = next_cursor(rows, more, window)
+
+    try:
+        tombstones, more = deleted_rows(cursors.get('t'), limit)
+    except (TypeError, ValueError, IndexError):
+        raise ValueError('Invalid sync token')
+    deleted = {table_name: [] for table_name in TOMBSTONED_TABLES}
+    for tombstone in tombstones:
+        deleted[tombstone.table_name].append(tombstone.row_id)
+    data['deleted'] = deleted
+    has_more = has_more or more
+    if tombstones:
+        cursors['t'] = next_cursor(tombstones, more, window, column='deleted_at')
+
+    return data, encode_token(cursors), has_more
+
+
+# Attached to every session by create_app, in this order
+SESSION_HOOKS = (
+    ('before_flush', record_tombstones),
+)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Load-test comparison for the gunicorn production profile
+Starts gunicorn with gunicorn.conf.py at several worker counts against a seeded
+database and measures throughput and latency of the job feed and detail reads,
+optionally while job streams are held open.
+
+Speedup between worker counts only means something with more cores than
+workers: on a single core every count measures about the same.
+
+Measured on a 1-core host against SQLite, 16 clients, 8s per run (streams
+are held open during the run: open/rejected/stalled):
+
+    profile                              req/s  p50 ms  p95 ms  streams
+    bare gunicorn, 1 sync worker         310.0   49.15   66.34  -
+      ... with 2 streams                   2.0   10008   10010  1/0/1, REST timed out
+    gthread, 2 workers x 4 threads       294.0   49.47  112.08  -
+      ... with 12 streams                317.2   47.88   81.05  4/8/0
+    gevent, 2 workers                    294.9   11.68  190.41  12/0/0
+
+One core cannot show throughput scaling with cores; the stream runs show
+what the profile buys: the bare server stalls behind one stream, gthread
+keeps serving with streams capped per worker, and gevent holds every stream
+but each blocking SQLite query holds up the whole worker (the p95).
+
+Usage:
+    python bench_load.py                            # 1 worker vs. the profile's default
+    python bench_load.py --workers 1,2,4 --threads 4
+    python bench_load.py --streams 50 --worker-class gthread   # REST latency next to open streams
+    python bench_load.py --duration 20 --clients 32 --json
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PATHS = ['/api/v1/jobs', '/api/v1/jobs/1', '/api/v1/users/1', '/api/v1/quotes?user_id=4']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(path):
+    """Create and seed the schema once, outside the timed runs"""
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='production',
+               RATELIMIT_ENABLED='False', GUNICORN_ACCESS_LOG='/dev/null')
+    subprocess.run(
+        [sys.executable, '-c', "import io, contextlib\n"
+                               "from app import create_app; from app.models import db; import seed\n"
+                               "app = create_app('production')\n"
+                               "with app.app_context():\n"
+                               "    db.create_all()\n"
+                               "    with contextlib.redirect_stdout(io.StringIO()): seed.seed_database()"],
+        cwd=HERE, env=env, check=True
+    )
+    return env
+
+
+def start_server(env, workers, threads, worker_class):
+    port = free_port()
+    env = dict(env, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+    if worker_class:
+        env['GUNICORN_WORKER_CLASS'] = worker_class
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not start with {workers} workers')
+
+
+def open_streams(port, count):
+    """Hold ``count`` job streams open like idle subscribers; return (sockets, rejected, stalled)"""
+    sockets, rejected, stalled = [], 0, 0
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+        sock.sendall(b'GET /api/v1/jobs/stream HTTP/1.1\r\nHost: bench\r\n\r\n')
+        try:
+            status = sock.recv(64).split(b' ', 2)[1]
+        except (socket.timeout, IndexError):
+            # No worker thread free to even start the stream
+            stalled += 1
+            sock.close()
+            continue
+        if status == b'200':
+            sockets.append(sock)
+        else:
+            rejected += 1
+            sock.close()
+    return sockets, rejected, stalled
+
+
+def client(args):
+    """Issue requests over one keep-alive connection until the deadline"""
+    port, deadline, offset = args
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    latencies = []
+    errors = 0
+    i = offset
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', PATHS[i % len(PATHS)])
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except OSError:
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    return latencies, errors
+
+
+def run_load(port, clients, duration):
+    # Warm every worker before timing
+    client((port, time.monotonic() + 1, 0))
+    deadline = time.monotonic() + duration
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client, [(port, deadline, i) for i in range(clients)])
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(errors for _, errors in results)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', help='comma-separated worker counts (default: 1 and cores + 1)')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--worker-class', help="gthread or gevent (default: the profile's choice)")
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per run')
+    parser.add_argument('--streams', type=int, default=0, help='job streams to hold open during each run')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    cores = multiprocessing.cpu_count()
+    worker_counts = [int(n) for n in args.workers.split(',')] if args.workers else sorted({1, cores + 1})
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = prepare_database(os.path.join(tmp, 'bench.db'))
+        for workers in worker_counts:
+            process, port = start_server(env, workers, args.threads, args.worker_class)
+            streams = []
+            try:
+                streams, rejected, stalled = open_streams(port, args.streams)
+                results.append({'workers': workers, 'streams_open': len(streams), 'streams_rejected': rejected,
+                                'streams_stalled': stalled, **run_load(port, args.clients, args.duration)})
+            finally:
+                for sock in streams:
+                    sock.close()
+                process.terminate()
+                process.wait()
+
+    # Extra workers can only be faster when there are cores for them to run on
+    scaling_measurable = cores > min(worker_counts)
+
+    if args.json:
+        print(json.dumps({'cores': cores, 'threads': args.threads, 'worker_class': args.worker_class or 'default',
+                          'streams': args.streams, 'scaling_measurable': scaling_measurable, 'results': results}))
+        return
+
+    baseline = results[0]['rps'] or 1
+    print(f"{cores} cores, {args.worker_class or 'default'} workers x {args.threads} threads, "
+          f"{args.clients} clients, {args.streams} streams, {args.duration:g}s per run")
+    print(f"  {'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} "
+          f"{'streams open/rejected/stalled':>30}")
+    for result in results:
+        speedup = f"{result['rps'] / baseline:.2f}x" if scaling_measurable else 'n/a'
+        streams = f"{result['streams_open']}/{result['streams_rejected']}/{result['streams_stalled']}"
+        print(f"  {result['workers']:>7} {result['rps']:>9} {speedup:>8} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['errors']:>7} {streams:>30}")
+    if not scaling_measurable:
+        print(f"  Speedup needs more cores than workers; this host has {cores}, so run it on a multi-core machine")
+
+
+if __name__ == '__main__':
+    main()
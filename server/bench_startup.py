@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Mtaa-Fundi Finder API
+Measures import time and time-to-first-request of a fresh worker process.
+
+Usage:
+    python bench_startup.py                     # 5 runs, print a summary
+    python bench_startup.py --runs 10 --json    # machine-readable output for CI
+    python bench_startup.py --budget 1.5        # exit non-zero if the median exceeds 1.5s
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app('production')
+created = time.perf_counter()
+response = app.test_client().get('/api/v1/jobs')
+assert response.status_code == 200, response.status_code
+first_request = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': first_request - created,
+    'total': first_request - start
+}))
+"""
+
+
+def prepare_database(path):
+    """Create the schema once, outside the timed runs"""
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    subprocess.run(
+        [sys.executable, '-c', "from app import create_app; from app.models import db\n"
+                               "app = create_app('production')\n"
+                               "with app.app_context(): db.create_all()"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True
+    )
+    return env
+
+
+def run_probe(env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--budget', type=float, help='maximum median total startup time in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = prepare_database(os.path.join(tmp, 'bench.db'))
+        samples = [run_probe(env) for _ in range(args.runs)]
+
+    summary = {
+        phase: round(statistics.median(sample[phase] for sample in samples), 4)
+        for phase in ('import', 'create_app', 'first_request', 'total')
+    }
+
+    if args.json:
+        print(json.dumps({'runs': args.runs, 'median_seconds': summary}))
+    else:
+        print(f"Startup over {args.runs} runs (median):")
+        for phase, seconds in summary.items():
+            print(f"  {phase:<14} {seconds * 1000:8.1f} ms")
+
+    if args.budget is not None and summary['total'] > args.budget:
+        print(f"Startup time {summary['total']:.3f}s exceeds budget of {args.budget:.3f}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for Mtaa-Fundi Finder API
+Seeds a large dataset, calls each endpoint through the test client, captures the SQL
+it runs and checks every statement's plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on
+PostgreSQL). Fails on full table scans, temp B-tree sorts and on endpoints that run
+more queries than their budget (e.g. an N+1 creeping into a listing).
+
+Usage:
+    python check_query_plans.py                      # SQLite, default dataset size
+    python check_query_plans.py --jobs 50000 -v      # bigger dataset, print every plan
+    python check_query_plans.py --json               # machine-readable output for CI
+    python check_query_plans.py --database-url postgresql://localhost/plan_check  # empty scratch database
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+COUNTIES = {
+    'Nairobi': ['Westlands', 'Karen', 'Kibera', 'Eastlands', 'Kawangware', 'Kilimani'],
+    'Mombasa': ['Nyali', 'Likoni', 'Bamburi'],
+    'Kisumu': ['Milimani', 'Kondele'],
+    'Nakuru': ['Lanet', 'Milimani'],
+}
+CATEGORIES = ['plumbing', 'electrical', 'painting', 'carpentry', 'roofing', 'masonry', 'cleaning']
+
+# Endpoint checks: (method, path, query budget, plan findings allowed, body).
+# Paths are formatted with ids from the dataset. Budgets count every statement,
+# writes and post-commit refreshes included. Allowed findings name tables that may
+# be scanned in full and "sort" for temp B-tree sorts, each with its reason.
+# Listings are filtered to stay under 500 rows: selectinload fetches related rows
+# in IN batches of 500, so bigger pages legitimately run more queries.
+CHECKS = [
+    # Listings
+    ('GET', '/api/v1/jobs?status=open&category=plumbing&budget_max=5000', 2, (), None),
+    ('GET', '/api/v1/jobs?status=open&sort=budget&budget_max=2000', 2, (), None),
+    ('GET', '/api/v1/jobs?status=open&sort=-budget&budget_min=98000', 2, (), None),
+    ('GET', '/api/v1/jobs?status=open&sort=preferred_date&date_from={week_ago}&date_to={week_ago}T23:59:59', 2, (), None),
+    ('GET', '/api/v1/jobs?location=Nairobi, Westlands&status=open', 2, (), None),
+    ('GET', '/api/v1/jobs?location=Nairobi, Westlands&status=open&saved_by={homeowner}', 3, (), None),
+    ('GET', '/api/v1/jobs?user_id={homeowner}', 2, (), None),
+    ('GET', '/api/v1/jobs?ids={job},{job2}&saved_by={homeowner}', 3, (), None),
+    ('GET', '/api/v1/users?role=fundi&sort=rating&limit=20', 1, (), None),
+    ('GET', '/api/v1/users?role=fundi&sort=reviews&limit=20&location=Nairobi', 1, (), None),
+    ('GET', '/api/v1/quotes?job_id={job}', 5, (), None),
+    ('GET', '/api/v1/quotes?user_id={fundi}', 4, (), None),
+    ('GET', '/api/v1/reviews?user_id={fundi}', 6, (), None),
+    ('GET', '/api/v1/users/{homeowner}/saved-jobs', 3, ('sort',), None),  # Orders the user's few saved jobs
+    # Details
+    ('GET', '/api/v1/jobs/{job}', 2, (), None),
+    ('GET', '/api/v1/users/{fundi}', 1, (), None),
+    ('GET', '/api/v1/users/by-phone/{phone}', 1, (), None),
+    ('GET', '/api/v1/quotes/{quote}', 4, (), None),
+    ('GET', '/api/v1/reviews/{review}', 4, (), None),
+    # The dashboard runs the same queries however many quotes and reviews the fundi has
+    ('GET', '/api/v1/users/{idle_fundi}/dashboard', 6, ('sort',), None),  # Groups one fundi's reviews by rating
+    ('GET', '/api/v1/users/{busy_fundi}/dashboard', 6, ('sort',), None),
+    # Aggregates
+    ('GET', '/api/v1/jobs/facets?status=open', 2, ('sort',), None),  # Groups by four columns, then looks up location paths
+    ('GET', '/api/v1/quotes/stats?job_id={job}', 2, (), None),  # The summary row, then its sketch buckets
+    ('GET', '/api/v1/sync?limit=100', 5, (), None),
+    ('GET', '/api/v1/stats/daily?date_from={week_ago}&category=plumbing', 1, (), None),
+    # Writes (each also updates its daily rollup row, and looks up the location path on its first use)
+    ('POST', '/api/v1/jobs', 10, ('sort',), {'user_id': '{homeowner}', 'title': 'Fix a leaking tap',
+                                             'description': 'Kitchen tap drips all night', 'category': 'plumbing',
+                                             'preferred_date': '2030-01-01T09:00:00',
+                                             'budget': 1500}),  # Ranks duplicate candidates by shared buckets
+    ('POST', '/api/v1/quotes', 15, (), {'job_id': '{job}', 'user_id': '{idle_fundi}', 'price': 2000,
+                                        'message': 'Can come tomorrow'}),
+]
+
+
+def seed_large_dataset(db, users, jobs, quotes_per_job, seed):
+    """Insert a dataset with realistic shape in bulk and return ids the checks refer to"""
+    from sqlalchemy import insert
+    from app.models import Location, User, Job, Quote, Review, saved_jobs
+    from app.quote_stats import rebuild_quote_stats
+    from app.rollups import rebuild_rollups
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    locations = []
+    for county, areas in COUNTIES.items():
+        locations.append({'name': county, 'path': county.lower(), 'depth': 0, 'parent_id': None})
+    db.session.execute(insert(Location), locations)
+    county_ids = {location.path: location.id for location in Location.query.all()}
+    db.session.execute(insert(Location), [
+        {'name': area, 'path': f'{county.lower()}/{area.lower()}', 'depth': 1, 'parent_id': county_ids[county.lower()]}
+        for county, areas in COUNTIES.items() for area in areas
+    ])
+    area_ids = {location.path: location.id for location in Location.query.filter(Location.depth == 1)}
+
+    user_rows = []
+    for i in range(users):
+        county = rng.choice(list(COUNTIES))
+        area = rng.choice(COUNTIES[county])
+        phone = f'+2547{i:08d}'
+        rating_count = rng.randint(0, 20)
+        user_rows.append({
+            'name': f'User {i}', 'phone': phone, 'phone_e164': phone,
+            'role': 'homeowner' if i % 3 else 'fundi',
+            'location': f'{county}, {area}', 'location_id': area_ids[f'{county.lower()}/{area.lower()}'],
+            'rating_count': rating_count, 'average_rating': round(rng.uniform(1, 5), 2) if rating_count else 0.0,
+            'created_at': now, 'updated_at': now - timedelta(minutes=i)
+        })
+    db.session.execute(insert(User), user_rows)
+    homeowners = list(db.session.scalars(db.select(User.id).where(User.role == 'homeowner')))
+    owner_locations = dict(db.session.execute(db.select(User.id, User.location_id)).all())
+    fundis = list(db.session.scalars(db.select(User.id).where(User.role == 'fundi')))
+
+    job_rows = []
+    for i in range(jobs):
+        owner = rng.choice(homeowners)
+        created = now - timedelta(minutes=jobs - i)
+        job_rows.append({
+            'user_id': owner, 'title': f'Job {i}', 'description': 'Seeded job',
+            'category': rng.choice(CATEGORIES), 'preferred_date': created + timedelta(days=rng.randint(1, 60)),
+            'budget': rng.randrange(500, 100000, 250), 'status': 'open' if rng.random() < 0.7 else 'closed',
+            'location_id': owner_locations[owner], 'created_at': created, 'updated_at': created
+        })
+    db.session.execute(insert(Job), job_rows)
+    job_ids = list(db.session.scalars(db.select(Job.id)))
+    job_owners = dict(db.session.execute(db.select(Job.id, Job.user_id)).all())
+    job_created = dict(db.session.execute(db.select(Job.id, Job.created_at)).all())
+
+    quote_rows = []
+    review_rows = []
+    for job_id in job_ids:
+        for fundi in rng.sample(fundis, min(quotes_per_job, len(fundis))):
+            created = job_created[job_id] + timedelta(minutes=rng.randint(1, 600))
+            quote_rows.append({'job_id': job_id, 'user_id': fundi, 'price': rng.randrange(500, 100000, 250),
+                               'message': 'Seeded quote', 'created_at': created, 'updated_at': created})
+        if rng.random() < 0.2:
+            created = job_created[job_id] + timedelta(days=2)
+            review_rows.append({'reviewer_id': job_owners[job_id], 'reviewee_id': rng.choice(fundis),
+                                'rating': rng.randint(1, 5), 'comment': 'Seeded review', 'job_id': job_id,
+                                'created_at': created, 'updated_at': created})
+    db.session.execute(insert(Quote), quote_rows)
+    db.session.execute(insert(Review), review_rows)
+    db.session.execute(insert(saved_jobs), [
+        {'user_id': user_id, 'job_id': job_id}
+        for user_id in homeowners[:200] for job_id in rng.sample(job_ids, min(5, len(job_ids)))
+    ])
+    db.session.commit()
+    rebuild_quote_stats()
+    rebuild_rollups()
+
+    # Refresh planner statistics, as a long-running database would have them
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+    quoted_fundi = db.session.scalar(db.select(Quote.user_id).order_by(Quote.id))
+    open_job = db.session.scalar(db.select(Job.id).where(Job.status == 'open').order_by(Job.id))
+    quoted_on_open = set(db.session.scalars(db.select(Quote.user_id).where(Quote.job_id == open_job)))
+    saved_by = db.session.scalar(db.select(saved_jobs.c.user_id))
+    return {
+        'homeowner': saved_by,
+        'phone': db.session.scalar(db.select(User.phone).where(User.id == saved_by)),
+        'fundi': quoted_fundi,
+        'idle_fundi': next(fundi for fundi in fundis if fundi not in quoted_on_open),
+        'job': open_job,
+        'job2': job_ids[-1],
+        'busy_fundi': db.session.scalar(db.select(Quote.user_id).group_by(Quote.user_id)
+                                        .order_by(db.func.count().desc()).limit(1)),
+        'quote': db.session.scalar(db.select(Quote.id).order_by(Quote.id.desc())),
+        'review': db.session.scalar(db.select(Review.id).order_by(Review.id.desc())),
+        'week_ago': (now - timedelta(days=7)).date().isoformat(),
+    }
+
+
+class StatementRecorder:
+    """Collects the SQL each engine runs while recording is on"""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.statements = []
+        self.recording = False
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, connection, cursor, statement, parameters, context, executemany):
+        if self.recording and not executemany:
+            self.statements.append((connection.engine, statement, parameters))
+
+    def capture(self, call):
+        self.statements = []
+        self.recording = True
+        try:
+            response = call()
+        finally:
+            self.recording = False
+        return response, self.statements
+
+
+def _sqlite_findings(connection, statement, parameters):
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    plan = [row[-1] for row in rows]
+    findings = []
+    for detail in plan:
+        scan = re.match(r'SCAN (\w+)(.*)', detail)
+        # "SCAN jobs USING INDEX ..." walks an index in order; only a bare SCAN reads the whole table
+        if scan and ' USING ' not in scan.group(2):
+            findings.append((scan.group(1), f'full table scan: {detail}'))
+        if 'USE TEMP B-TREE' in detail:
+            findings.append(('sort', f'temp B-tree sort: {detail}'))
+    return plan, findings
+
+
+def _postgresql_findings(connection, statement, parameters):
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    findings = []
+    lines = []
+
+    def walk(node, depth=0):
+        relation = node.get('Relation Name')
+        lines.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+        if node['Node Type'] == 'Seq Scan':
+            findings.append((relation, f'full table scan: Seq Scan on {relation}'))
+        if node['Node Type'] in ('Sort', 'Incremental Sort'):
+            findings.append(('sort', f"sort: {', '.join(node.get('Sort Key', []))}"))
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk((plan if isinstance(plan, list) else json.loads(plan))[0]['Plan'])
+    return lines, findings
+
+
+def explain(engine, statement, parameters):
+    """(plan lines, [(table or "sort", finding)]) of one captured statement"""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            return _postgresql_findings(connection, statement, parameters)
+        return _sqlite_findings(connection, statement, parameters)
+
+
+def _explainable(statement):
+    return statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def _format(value, ids):
+    if isinstance(value, dict):
+        return {key: _format(item, ids) for key, item in value.items()}
+    if isinstance(value, str) and re.fullmatch(r'\{\w+\}', value):
+        return ids[value[1:-1]]
+    return value
+
+
+def run_checks(app, recorder, ids, verbose=False):
+    client = app.test_client()
+    results = []
+    for method, path, budget, allowed, body in CHECKS:
+        url = path.format(**ids)
+        response, statements = recorder.capture(lambda: client.open(url, method=method, json=_format(body, ids)))
+        problems = []
+        if response.status_code >= 400:
+            problems.append(f'responded {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        if len(statements) > budget:
+            problems.append(f'ran {len(statements)} queries, budget is {budget}')
+
+        plans = []
+        for engine, statement, parameters in statements:
+            if not _explainable(statement):
+                continue
+            plan, findings = explain(engine, statement, parameters)
+            plans.append({'sql': ' '.join(statement.split()), 'plan': plan})
+            problems.extend(f'{finding} in: {" ".join(statement.split())[:160]}'
+                            for subject, finding in findings if subject not in allowed)
+
+        results.append({'method': method, 'path': url, 'queries': len(statements), 'budget': budget,
+                        'problems': problems, **({'plans': plans} if verbose else {})})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--jobs', type=int, default=20000)
+    parser.add_argument('--quotes-per-job', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help='empty scratch database to use instead of a temporary SQLite file')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('-v', '--verbose', action='store_true', help='include the SQL and plan of every query')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update(
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(tmp.name, 'plans.db')}",
+        RATELIMIT_ENABLED='False', ROW_CACHE_ENABLED='False', AUTO_CREATE_TABLES='False', SHARD_DATABASE_URLS=''
+    )
+    from sqlalchemy import inspect
+    from app import create_app
+    from app.models import db
+
+    app = create_app('production')
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if inspect(db.engine).get_table_names():
+            parser.error('the database must be empty; its tables are dropped afterwards')
+        db.create_all()
+        try:
+            ids = seed_large_dataset(db, args.users, args.jobs, args.quotes_per_job, args.seed)
+            recorder = StatementRecorder(db.engines.values())
+            results = run_checks(app, recorder, ids, args.verbose)
+        finally:
+            db.session.remove()
+            db.drop_all()
+    tmp.cleanup()
+
+    failed = [result for result in results if result['problems']]
+    if args.json:
+        print(json.dumps({'dialect': dialect, 'results': results}, default=str))
+    else:
+        for result in results:
+            status = 'FAIL' if result['problems'] else 'ok'
+            print(f"{status:>4}  {result['method']:<4} {result['path']}  ({result['queries']}/{result['budget']} queries)")
+            for problem in result['problems']:
+                print(f'        {problem}')
+            for entry in result.get('plans', []):
+                print(f"        {entry['sql'][:200]}")
+                for line in entry['plan']:
+                    print(f'          {line}')
+        print(f'{len(results) - len(failed)}/{len(results)} endpoints passed')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rate-limit cost check for Mtaa-Fundi Finder API
+Prices requests with the limiter's cost rules and fails when one is charged
+other than expected, e.g. an unfiltered listing slipping through at the
+filtered price behind a junk or empty query parameter.
+
+Usage:
+    python check_rate_limits.py
+"""
+
+import os
+import sys
+import tempfile
+
+# (method, path, cost as a config key or a number of tokens)
+CHECKS = [
+    ('GET', '/api/v1/jobs', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/jobs?_=1', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/jobs?status=', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/jobs?sort=budget&fields=id,title&saved_by=1', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/users?role=&location=', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/quotes?expand=job', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/reviews?format=compound', 'RATELIMIT_UNFILTERED_LIST_COST'),
+    ('GET', '/api/v1/jobs?status=open', 1),
+    ('GET', '/api/v1/jobs?ids=1,2', 1),
+    ('GET', '/api/v1/users?limit=20', 1),
+    ('GET', '/api/v1/quotes?job_id=1', 1),
+    ('GET', '/api/v1/reviews?user_id=1', 1),
+    ('GET', '/api/v1/jobs/1', 1),
+    ('POST', '/api/v1/jobs', 'RATELIMIT_WRITE_COST'),
+]
+
+
+def main():
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp.name, 'limits.db')}", SHARD_DATABASE_URLS='')
+    from app import create_app
+    from app.ratelimit import rate_limiter
+
+    app = create_app('production')
+    failed = 0
+    for method, path, expected in CHECKS:
+        if isinstance(expected, str):
+            expected = app.config[expected]
+        with app.test_request_context(path, method=method):
+            from flask import request
+            cost = rate_limiter.cost(request.endpoint, method, request.args)
+        ok = cost == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {method:<4} {path}  (costs {cost}, expected {expected})")
+    tmp.cleanup()
+    print(f'{len(CHECKS) - failed}/{len(CHECKS)} costs as expected')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
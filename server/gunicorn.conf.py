@@ -0,0 +1,69 @@
+"""Gunicorn configuration for the Mtaa-Fundi Finder API
+
+Every setting can be overridden from the environment, e.g.
+    GUNICORN_WORKERS=4 GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import multiprocessing
+import os
+
+cores = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Job streams hold their connection open for minutes. Under gthread each pins one
+# of the worker's threads, so streams are capped per worker below and the other
+# threads keep serving the API. gevent serves streams as cheap greenlets, but only
+# once the database driver is cooperative: a plain psycopg2 or sqlite3 call blocks
+# every greenlet in the worker, so one slow query stalls all its requests and
+# streams. It is therefore opt-in, with GUNICORN_WORKER_CLASS=gevent after
+# `pip install gevent psycogreen`; post_fork then patches psycopg2 with psycogreen.
+# SQLite has no such patch and is best left on gthread.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+# One process per core plus one, so a worker blocked on the database does
+# not leave a core idle; threads (or greenlets) cover the rest of the I/O wait.
+workers = int(os.getenv('GUNICORN_WORKERS', cores + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+if worker_class == 'gevent':
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+else:
+    # Streams may take at most half of each worker's threads; the rest keep serving the API
+    os.environ.setdefault('JOB_STREAM_MAX_SUBSCRIBERS', str(max(threads // 2, 1)))
+
+# Hold idle connections open briefly for the load balancer in front of us
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers to bound slow leaks; the jitter stops them all restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+
+# Load the app once in the master so workers fork with modules already imported.
+# Not under gevent, which must patch threading before the app creates its locks.
+preload_app = os.getenv('GUNICORN_PRELOAD', str(worker_class != 'gevent')).lower() == 'true'
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections instead of the master's, and make them cooperative under gevent"""
+    if worker_class == 'gevent':
+        _patch_database_driver(server)
+    if server.cfg.preload_app:
+        from app import dispose_engines
+        dispose_engines(worker.app.wsgi())
+
+
+def _patch_database_driver(server):
+    if not os.getenv('DATABASE_URL', '').startswith('postgres'):
+        server.log.warning('gevent workers with SQLite: every query blocks the whole worker; prefer gthread')
+        return
+    try:
+        import psycogreen.gevent
+    except ImportError:
+        raise RuntimeError('gevent workers need psycogreen so PostgreSQL queries do not block the worker: '
+                           'pip install psycogreen, or use GUNICORN_WORKER_CLASS=gthread')
+    psycogreen.gevent.patch_psycopg()
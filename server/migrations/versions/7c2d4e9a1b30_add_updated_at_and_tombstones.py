@@ -0,0 +1,44 @@
+"""add updated_at and tombstones
+
+Revision ID: 7c2d4e9a1b30
+Revises: 01f0b9af6ea2
+Create Date: 2026-10-19 05:46:12.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d4e9a1b30'
+down_revision = '01f0b9af6ea2'
+branch_labels = None
+depends_on = None
+
+TABLES = ['users', 'jobs', 'quotes', 'reviews']
+
+
+def upgrade():
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_updated_at'), ['updated_at'], unique=False)
+
+        # Existing rows count as last updated when they were created
+        op.execute(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL')
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_updated_at'))
+            batch_op.drop_column('updated_at')
+
+    op.drop_table('tombstones')
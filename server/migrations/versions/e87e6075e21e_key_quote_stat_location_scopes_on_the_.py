@@ -0,0 +1,96 @@
+"""key quote stat location scopes on the job location
+
+Revision ID: e87e6075e21e
+Revises: 808ba0802f09
+Create Date: 2026-10-19 07:00:23.972131
+
+"""
+import math
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e87e6075e21e'
+down_revision = '808ba0802f09'
+branch_labels = None
+depends_on = None
+
+# Bucket width of the quote price sketch (1% relative accuracy)
+LOG_GAMMA = math.log(1.01 / 0.99)
+
+QUOTE_STATS = sa.table('quote_stats', sa.column('scope', sa.String), sa.column('quote_count', sa.Integer),
+                       sa.column('price_total', sa.Float), sa.column('min_price', sa.Float),
+                       sa.column('max_price', sa.Float), sa.column('updated_at', sa.DateTime))
+QUOTE_STAT_BUCKETS = sa.table('quote_stat_buckets', sa.column('scope', sa.String), sa.column('bucket', sa.Integer),
+                              sa.column('count', sa.Integer))
+QUOTES = sa.table('quotes', sa.column('job_id', sa.Integer), sa.column('price', sa.Float))
+JOBS = sa.table('jobs', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                sa.column('category', sa.String), sa.column('location_id', sa.Integer))
+USERS = sa.table('users', sa.column('id', sa.Integer), sa.column('location', sa.String))
+LOCATIONS = sa.table('locations', sa.column('id', sa.Integer), sa.column('path', sa.String))
+
+
+def upgrade():
+    # Location scopes were keyed on the owner's free-text location; they now follow the job's place in
+    # the location hierarchy. Quotes in county shards are not visible here: sharded deployments run
+    # `flask rebuild-quote-stats` after upgrading
+    rows = sa.select(QUOTES.c.price, JOBS.c.category, LOCATIONS.c.path).select_from(
+        QUOTES.join(JOBS, QUOTES.c.job_id == JOBS.c.id).join(LOCATIONS, JOBS.c.location_id == LOCATIONS.c.id)
+    )
+    rebuild_location_scopes(rows, _path_keys)
+
+
+def downgrade():
+    rows = sa.select(QUOTES.c.price, JOBS.c.category, USERS.c.location).select_from(
+        QUOTES.join(JOBS, QUOTES.c.job_id == JOBS.c.id).join(USERS, JOBS.c.user_id == USERS.c.id)
+    )
+    rebuild_location_scopes(rows, _free_text_keys)
+
+
+def _path_keys(path):
+    """"nairobi/westlands" -> ["nairobi/westlands", "nairobi"]"""
+    parts = path.split('/') if path else []
+    return ['/'.join(parts[:depth]) for depth in range(len(parts), 0, -1)]
+
+
+def _free_text_keys(location):
+    """"Nairobi, Westlands" -> ["nairobi, westlands", "nairobi"], as keyed before this revision"""
+    full = ', '.join(part.strip() for part in (location or '').lower().split(',') if part.strip())
+    keys = [full] if full else []
+    county = full.split(',')[0]
+    if county and county != full:
+        keys.append(county)
+    return keys
+
+
+def rebuild_location_scopes(rows, location_keys):
+    """Replace every location scope's summary and sketch buckets with ones computed from ``rows``"""
+    connection = op.get_bind()
+    located = sa.or_(QUOTE_STATS.c.scope.like('location:%'), QUOTE_STATS.c.scope.like('%|location:%'))
+    connection.execute(QUOTE_STATS.delete().where(located))
+    connection.execute(QUOTE_STAT_BUCKETS.delete().where(sa.or_(QUOTE_STAT_BUCKETS.c.scope.like('location:%'),
+                                                                QUOTE_STAT_BUCKETS.c.scope.like('%|location:%'))))
+
+    now = datetime.utcnow()
+    stats, buckets = {}, {}
+    for price, category, location in connection.execute(rows):
+        for key in location_keys(location):
+            for scope in (f'location:{key}', f'category:{category.lower()}|location:{key}'):
+                stat = stats.setdefault(scope, {'scope': scope, 'quote_count': 0, 'price_total': 0.0,
+                                                'min_price': price, 'max_price': price, 'updated_at': now})
+                stat['quote_count'] += 1
+                stat['price_total'] += price
+                stat['min_price'] = min(stat['min_price'], price)
+                stat['max_price'] = max(stat['max_price'], price)
+                if price > 0:
+                    bucket = math.ceil(math.log(price) / LOG_GAMMA)
+                    buckets[scope, bucket] = buckets.get((scope, bucket), 0) + 1
+    if stats:
+        connection.execute(QUOTE_STATS.insert(), list(stats.values()))
+    if buckets:
+        connection.execute(QUOTE_STAT_BUCKETS.insert(),
+                           [{'scope': scope, 'bucket': bucket, 'count': count}
+                            for (scope, bucket), count in buckets.items()])
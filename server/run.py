@@ -8,8 +8,7 @@ Usage:
     FLASK_ENV=production python run.py  # Run in production mode
 """
 
-from app import create_app
-from app.models import db
+from app import create_app, create_tables
 import os
 
 # Create Flask application
@@ -17,8 +16,7 @@ app = create_app(os.getenv('FLASK_ENV', 'development'))
 
 if __name__ == '__main__':
     # Create database tables if they don't exist
-    with app.app_context():
-        db.create_all()
+    create_tables(app)
 
     # Run the application
     app.run(
@@ -1,13 +1,11 @@
 import os
-from app import create_app
-from app.models import db
+from app import create_app, create_tables
 
 # Create Flask application
 application = create_app(os.getenv('FLASK_ENV', 'development'))
 
-# Create database tables if they don't exist
-with application.app_context():
-    db.create_all()
+# Create database tables if they don't exist (skipped in production, which runs migrations)
+create_tables(application)
 
 if __name__ == "__main__":
     application.run()
\ No newline at end of file
@@ -3,12 +3,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'server'))
 
 from app import create_app
-from app.models import db
 
-app = create_app()
-
-with app.app_context():
-    db.create_all()
+# Served by gunicorn in production; the schema comes from the release phase's migrations
+app = create_app('production')
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file